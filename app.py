@@ -1,15 +1,172 @@
+import time
+# Startup clock, see MainWindow.startup
+STARTUP_T0 = time.perf_counter()
+
+import json
+import os
 import sys
-import cv2
-import numpy as np
-import configparser
-from PyQt5.QtCore import QTimer, Qt
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QStackedWidget, QSlider, QFormLayout, QSpinBox, QHBoxLayout, QFrame, QGroupBox
-from PyQt5.QtGui import QImage, QPixmap, QFont
-from camera import IDSCamera
+import threading
+from PyQt5.QtCore import QTimer, Qt, QObject, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QStackedWidget, QSlider, QFormLayout, QSpinBox, QHBoxLayout, QFrame, QGroupBox, QComboBox, QGridLayout
+from PyQt5.QtGui import QFont
 from impl import Imgpr
+from pipeline import FramePipeline, DROP_OLDEST, BLOCK
+from display import FrameDisplay
+from estimator import StatefulDetector
+from autoroi import AutoRoiCamera
+from multicam import CameraManager
+from scene_cache import SceneCache
+from params import ANGLE_METHODS, ParameterStore, SettingsWatcher
+
+IMPORT_SECONDS = time.perf_counter() - STARTUP_T0
 
 # Config file path
 CONFIG_FILE = 'settings.ini'
+# How often settings.ini is checked for outside edits (tune.py, hand edits), in seconds
+SETTINGS_POLL_INTERVAL = 1.0
+
+# Capture/processing pipeline
+PIPELINE_QUEUE_SIZE = 2
+PIPELINE_DROP_POLICY = DROP_OLDEST
+
+# Camera backend: 'ids' for the IDS peak camera, 'simulated' to run without hardware or SDK, 'replay' for a recording
+CAMERA_BACKEND = os.environ.get('PAF_CAMERA', 'ids')
+# SimulatedCamera options, source is an image, image directory, video file or None for a synthetic disc
+SIMULATED_CAMERA = {
+    'source': os.environ.get('PAF_SIM_SOURCE') or None,
+    'fps': float(os.environ.get('PAF_SIM_FPS', 25)),
+    'jitter': 0.1,
+    'drop_rate': 0.01,
+    'incomplete_rate': 0.01,
+}
+
+# ReplayCamera options, path is the recording (see recording.py), speed None for as fast as possible
+REPLAY_CAMERA = {
+    'path': os.environ.get('PAF_REPLAY'),
+    'speed': float(os.environ.get('PAF_REPLAY_SPEED', 1)) or None,
+}
+# Replaying as fast as possible, the capture thread waits for detection so every recorded frame is processed
+if CAMERA_BACKEND == 'replay' and REPLAY_CAMERA['speed'] is None:
+    PIPELINE_DROP_POLICY = BLOCK
+
+# Record every camera's raw frames to <dir>/<serial>-<start time>, None to disable
+RECORD_DIR = os.environ.get('PAF_RECORD_DIR') or None
+# 'raw' or 'png' (lossless, encoded off the capture thread)
+RECORD_COMPRESSION = os.environ.get('PAF_RECORD_COMPRESSION', 'raw')
+
+# Driver buffer ring. capture_frame() copies each frame out and requeues the buffer at once,
+# so the ring only has to absorb capture thread stalls, not the frames held by the pipeline queues
+CAMERA_NUM_BUFFERS = 8
+
+# Multi-camera view: None for the single camera window, 'all' for every device, or comma-separated serial numbers
+CAMERA_SERIALS = os.environ.get('PAF_CAMERAS') or None
+# Number of cameras 'all' gives with the simulated backend
+SIMULATED_CAMERA_COUNT = 2
+# Detection threads shared by all cameras of the multi-camera view, None for one per CPU
+DETECTION_WORKERS = None
+MULTI_CAMERA_PREVIEW_SCALE = 0.4
+
+# Metrics: Prometheus text on http://127.0.0.1:<port>/metrics and a rotating JSON log, None to disable
+METRICS_PORT = 9108
+METRICS_LOG_FILE = 'metrics.jsonl'
+METRICS_PANEL_INTERVAL_MS = 500
+
+# Run the Hough stages on every n-th frame and report the filtered angle in between
+DETECT_EVERY_N_FRAMES = 3
+
+# Reuse the last detection while the scene stays put (see SceneCache), None to detect every frame
+SCENE_CACHE = {'threshold': 8, 'max_entries': 4, 'max_age': 5.0}
+
+# Crop the sensor to the detected disc (padding in pixels), None to always read the full frame
+AUTO_ROI_PAD = 40
+
+# Search a window around the last disc instead of the full frame
+TRACK_CIRCLE = True
+
+# One JSON line per launch: import time, window shown, camera ready, first frame (seconds), None to disable
+STARTUP_LOG_FILE = 'startup.jsonl'
+
+# Camera bring-up steps run by CameraStarter: (method, progress text, status on failure)
+CAMERA_BRINGUP = [
+    ('open_camera', 'Opening camera', 'Camera Status: Not Connected'),
+    ('prepare_acquisition', 'Preparing acquisition', 'Camera Status: prepare error'),
+    ('enable_polarize_angle', 'Enabling polarization angle', 'Camera Status: enable mode error'),
+    ('enable_intensity', 'Enabling intensity', 'Camera Status: enable mode error'),
+    ('config_image', 'Configuring image', 'Camera Status: config error'),
+    ('alloc_and_announce_buffers', 'Allocating buffers', 'Camera Status: alloc and announce buffer error'),
+    ('start_acquisition', 'Starting acquisition', 'Camera Status: start acquisition error'),
+]
+
+def create_camera(serial=None):
+    """ Camera for CAMERA_BACKEND. ids_peak is only imported for the IDS backend. """
+    if CAMERA_BACKEND == 'simulated':
+        from sim_camera import SimulatedCamera
+        return SimulatedCamera(**dict(SIMULATED_CAMERA, serial=serial or 'SIM0'))
+    if CAMERA_BACKEND == 'replay':
+        # In the multi-camera view the "serial numbers" are recording paths
+        from recording import ReplayCamera
+        return ReplayCamera(serial or REPLAY_CAMERA['path'], speed=REPLAY_CAMERA['speed'], serial=serial or 'REPLAY')
+    from camera import IDSCamera
+    return IDSCamera(num_buffers=CAMERA_NUM_BUFFERS, serial=serial)
+
+def list_camera_serials():
+    """ Serial numbers CAMERA_SERIALS refers to. Device discovery for 'all', so call it off the UI thread. """
+    if CAMERA_SERIALS != 'all':
+        return [serial.strip() for serial in CAMERA_SERIALS.split(',') if serial.strip()]
+    if CAMERA_BACKEND == 'simulated':
+        return [f'SIM{i}' for i in range(SIMULATED_CAMERA_COUNT)]
+    if CAMERA_BACKEND == 'replay':
+        return [REPLAY_CAMERA['path']]
+    from camera import list_serials
+    return list_serials()
+
+def start_recording(source, serial):
+    """ (source wrapped in a RecordingCamera, recorder) with RECORD_DIR set, else (source, None). """
+    if RECORD_DIR is None:
+        return source, None
+    from recording import FrameRecorder, RecordingCamera
+    name = f"{serial or 'camera'}-{time.strftime('%Y%m%d-%H%M%S')}"
+    try:
+        recorder = FrameRecorder(os.path.join(RECORD_DIR, name), RECORD_COMPRESSION,
+                                 metadata={'serial': serial, 'backend': CAMERA_BACKEND}).open()
+    except (OSError, ValueError) as e:
+        print(f"Failed to start recording: {e}")
+        return source, None
+    return RecordingCamera(source, recorder), recorder
+
+class CameraStarter(QObject):
+    """ Loads the camera backend and runs CAMERA_BRINGUP on a worker thread.
+
+    The SDK import, device discovery and configuration can take seconds,
+    so they stay off the UI thread. Progress and the result come back as
+    Qt signals, which are delivered on the UI thread.
+    """
+    progress = pyqtSignal(str)
+    # (camera or None, status text, success)
+    finished = pyqtSignal(object, str, bool)
+
+    def __init__(self, serial=None):
+        super().__init__()
+        self.serial = serial
+
+    def start(self):
+        threading.Thread(target=self._run, name='camera-start', daemon=True).start()
+
+    def _run(self):
+        self.progress.emit('Camera Status: Loading camera backend')
+        try:
+            camera = create_camera(self.serial)
+        except Exception as e:
+            print(f"Failed to load camera backend: {e}")
+            self.finished.emit(None, f'Camera Status: backend error ({e})', False)
+            return
+
+        for step, (method, text, error) in enumerate(CAMERA_BRINGUP):
+            self.progress.emit(f'Camera Status: {text} ({step + 1}/{len(CAMERA_BRINGUP)})')
+            if not getattr(camera, method)():
+                self.finished.emit(camera, error, False)
+                return
+        self.finished.emit(camera, 'Camera Status: Ready', True)
 
 class VideoStreamWidget(QWidget):
     def __init__(self):
@@ -27,6 +184,8 @@ class VideoStreamWidget(QWidget):
         self.program_status_label = QLabel('Program Status: Ready')
         self.ink_angle_label = QLabel('Ink angle: None')
         self.polar_angle_label = QLabel('Polarize angle: None')
+        self.metrics_label = QLabel('Metrics: -')
+        self.metrics_label.setFont(QFont("Courier", 9))
 
         # Create buttons
         self.start_button = QPushButton('Start Detection')
@@ -50,6 +209,8 @@ class VideoStreamWidget(QWidget):
         status_layout.addWidget(self.camera_status_label)
         status_layout.addWidget(self.motor_status_label)
         status_layout.addWidget(self.program_status_label)
+        status_layout.addWidget(self.ink_angle_label)
+        status_layout.addWidget(self.metrics_label)
         status_layout.addStretch()
 
         # Create group box for buttons
@@ -86,25 +247,33 @@ class SettingsWidget(QWidget):
         self.threshold_slider = QSlider(Qt.Horizontal)
         self.threshold_slider.setMinimum(0)
         self.threshold_slider.setMaximum(255)
-        self.threshold_slider.setValue(100)
+        self.threshold_slider.setValue(90)
         self.threshold_slider.setStyleSheet(self.get_slider_style())
 
         self.houghlinesp_min_line_length = QSpinBox()
+        self.houghlinesp_min_line_length.setRange(0, 1000)
         self.houghlinesp_min_line_length.setValue(50)
         self.houghlinesp_min_line_length.setFont(QFont("Arial", 12))
 
         self.houghlinesp_max_line_gap = QSpinBox()
+        self.houghlinesp_max_line_gap.setRange(0, 1000)
         self.houghlinesp_max_line_gap.setValue(10)
         self.houghlinesp_max_line_gap.setFont(QFont("Arial", 12))
 
         self.houghcircle_param1 = QSpinBox()
-        self.houghcircle_param1.setValue(100)
+        self.houghcircle_param1.setRange(1, 500)
+        self.houghcircle_param1.setValue(75)
         self.houghcircle_param1.setFont(QFont("Arial", 12))
 
         self.houghcircle_param2 = QSpinBox()
-        self.houghcircle_param2.setValue(30)
+        self.houghcircle_param2.setRange(1, 500)
+        self.houghcircle_param2.setValue(80)
         self.houghcircle_param2.setFont(QFont("Arial", 12))
 
+        self.angle_method = QComboBox()
+        self.angle_method.addItems(ANGLE_METHODS)
+        self.angle_method.setFont(QFont("Arial", 12))
+
         # Create save and back buttons
         self.save_button = QPushButton('Save Settings')
         self.back_button = QPushButton('Back')
@@ -124,6 +293,7 @@ class SettingsWidget(QWidget):
         layout.addRow('HoughLinesP Max Line Gap', self.houghlinesp_max_line_gap)
         layout.addRow('HoughCircle Param1', self.houghcircle_param1)
         layout.addRow('HoughCircle Param2', self.houghcircle_param2)
+        layout.addRow('Angle Method', self.angle_method)
         layout.addRow(button_layout)
         self.setLayout(layout)
 
@@ -161,7 +331,21 @@ class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.img_processing = Imgpr()
+        # Detection parameters, read by the processing thread once per frame
+        self.param_store = ParameterStore()
+        self.settings_watcher = SettingsWatcher(self.param_store, CONFIG_FILE, SETTINGS_POLL_INTERVAL)
+        self.img_processing = Imgpr(track_circle=TRACK_CIRCLE, params=self.param_store)
+        self.frame_display = FrameDisplay(self.img_processing, scale=0.8)
+        self.camera = None
+        self.pipeline = None
+        self.metrics_server = None
+        self.metrics_log = None
+        self.recorder = None
+        self.scene_cache = None
+        self.camera_starter = None
+        self._closing = False
+        # Seconds since STARTUP_T0, filled in as the milestones are reached
+        self.startup = {'import_s': IMPORT_SECONDS}
                 
         # Create main stack widget to switch between video stream and settings
         self.stacked_widget = QStackedWidget()
@@ -181,8 +365,9 @@ class MainWindow(QWidget):
         self.settings_widget.save_button.clicked.connect(self.save_settings)
         self.settings_widget.back_button.clicked.connect(self.show_video_stream_page)
 
-        # Load settings from config file
+        # Load settings from config file, then follow edits made to it while running
         self.load_settings()
+        self.settings_watcher.start()
 
         # Connect button actions
         self.video_stream_widget.start_button.clicked.connect(self.start_detection)
@@ -191,6 +376,8 @@ class MainWindow(QWidget):
         # Initialize timer for updating video stream
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.update_metrics_panel)
 
         # Initialize camera
         # self.cap = cv2.VideoCapture(0)
@@ -215,12 +402,19 @@ class MainWindow(QWidget):
         self.stacked_widget.setCurrentWidget(self.video_stream_widget)
 
     def save_settings(self):
-        # Update parameters from the settings widget
-        self.parameters['threshold'] = self.settings_widget.threshold_slider.value()
-        self.parameters['houghlinesp_min_line_length'] = self.settings_widget.houghlinesp_min_line_length.value()
-        self.parameters['houghlinesp_max_line_gap'] = self.settings_widget.houghlinesp_max_line_gap.value()
-        self.parameters['houghcircle_param1'] = self.settings_widget.houghcircle_param1.value()
-        self.parameters['houghcircle_param2'] = self.settings_widget.houghcircle_param2.value()
+        # Update parameters from the settings widget, the processing thread picks them up on its next frame
+        try:
+            self.param_store.update(
+                threshold=self.settings_widget.threshold_slider.value(),
+                houghlinesp_min_line_length=self.settings_widget.houghlinesp_min_line_length.value(),
+                houghlinesp_max_line_gap=self.settings_widget.houghlinesp_max_line_gap.value(),
+                houghcircle_param1=self.settings_widget.houghcircle_param1.value(),
+                houghcircle_param2=self.settings_widget.houghcircle_param2.value(),
+                angle_method=self.settings_widget.angle_method.currentText())
+        except (KeyError, ValueError) as e:
+            print(f"Invalid settings: {e}")
+            return
+        self.show_parameters(self.param_store.current)
 
         # Save parameters to config file
         self.save_to_config_file()
@@ -229,145 +423,337 @@ class MainWindow(QWidget):
         self.show_video_stream_page()
 
     def load_settings(self):
-        # Create a config parser object
-        config = configparser.ConfigParser()
-
-        # Check if the config file exists
         try:
-            config.read(CONFIG_FILE)
-            self.parameters = {
-                'threshold': int(config.get('Settings', 'threshold', fallback='100')),
-                'houghlinesp_min_line_length': int(config.get('Settings', 'houghlinesp_min_line_length', fallback='50')),
-                'houghlinesp_max_line_gap': int(config.get('Settings', 'houghlinesp_max_line_gap', fallback='10')),
-                'houghcircle_param1': int(config.get('Settings', 'houghcircle_param1', fallback='100')),
-                'houghcircle_param2': int(config.get('Settings', 'houghcircle_param2', fallback='30'))
-            }
-
-            # Update settings widget with loaded values
-            self.settings_widget.threshold_slider.setValue(self.parameters['threshold'])
-            self.settings_widget.houghlinesp_min_line_length.setValue(self.parameters['houghlinesp_min_line_length'])
-            self.settings_widget.houghlinesp_max_line_gap.setValue(self.parameters['houghlinesp_max_line_gap'])
-            self.settings_widget.houghcircle_param1.setValue(self.parameters['houghcircle_param1'])
-            self.settings_widget.houghcircle_param2.setValue(self.parameters['houghcircle_param2'])
-
+            self.param_store.load(CONFIG_FILE)
         except Exception as e:
             print(f"Failed to load settings: {e}")
-            # Set default values if loading fails
-            self.parameters = {
-                'threshold': 100,
-                'houghlinesp_min_line_length': 50,
-                'houghlinesp_max_line_gap': 10,
-                'houghcircle_param1': 100,
-                'houghcircle_param2': 30
-            }
+            # Keep the defaults
+        self.show_parameters(self.param_store.current)
+
+    def show_parameters(self, params):
+        """ Mirror a DetectionParams in self.parameters and the settings widget. """
+        self.parameters = params.to_dict()
+        self.shown_params_version = params.version
+        self.settings_widget.threshold_slider.setValue(params.threshold)
+        self.settings_widget.houghlinesp_min_line_length.setValue(params.houghlinesp_min_line_length)
+        self.settings_widget.houghlinesp_max_line_gap.setValue(params.houghlinesp_max_line_gap)
+        self.settings_widget.houghcircle_param1.setValue(params.houghcircle_param1)
+        self.settings_widget.houghcircle_param2.setValue(params.houghcircle_param2)
+        self.settings_widget.angle_method.setCurrentText(params.angle_method)
 
     def save_to_config_file(self):
-        # Create a config parser object
-        config = configparser.ConfigParser()
-
-        # Add settings section
-        config.add_section('Settings')
-        config.set('Settings', 'threshold', str(self.parameters['threshold']))
-        config.set('Settings', 'houghlinesp_min_line_length', str(self.parameters['houghlinesp_min_line_length']))
-        config.set('Settings', 'houghlinesp_max_line_gap', str(self.parameters['houghlinesp_max_line_gap']))
-        config.set('Settings', 'houghcircle_param1', str(self.parameters['houghcircle_param1']))
-        config.set('Settings', 'houghcircle_param2', str(self.parameters['houghcircle_param2']))
-
-        # Write to config file
-        with open(CONFIG_FILE, 'w') as configfile:
-            config.write(configfile)
-            
+        # Keys without a widget (e.g. canny_threshold from tune.py) are kept
+        try:
+            self.param_store.save(CONFIG_FILE)
+        except OSError as e:
+            print(f"Failed to save settings: {e}")
+        # Our own write must not count as an external edit
+        self.settings_watcher.check()
+
     def run_camera(self):
-        self.camera = IDSCamera()
-        if not self.camera.open_camera():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: Not Connected')
-            return
-        
-        if not self.camera.prepare_acquisition():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: prepare error')
+        """ Start camera bring-up in the background, on_camera_started() continues on the UI thread. """
+        self.camera_starter = CameraStarter()
+        self.camera_starter.progress.connect(self.video_stream_widget.camera_status_label.setText)
+        self.camera_starter.finished.connect(self.on_camera_started)
+        self.camera_starter.start()
+
+    def on_camera_started(self, camera, status, ok):
+        self.camera = camera
+        self.video_stream_widget.camera_status_label.setText(status)
+        if self._closing:
+            if camera is not None:
+                camera.dispose()
+            self.camera = None
             return
-        
-        if not self.camera.enable_polarize_angle():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: enable mode error')
+        if not ok:
             return
-        
-        if not self.camera.enable_intensity():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: enable mode error')
+        self.record_startup('camera_ready_s')
+
+        # Capture and detection run on their own threads, the timer only displays the latest result
+        processor = self.img_processing
+        if SCENE_CACHE is not None:
+            self.scene_cache = processor = SceneCache(self.img_processing, **SCENE_CACHE)
+        self.detector = StatefulDetector(processor, detect_every=DETECT_EVERY_N_FRAMES)
+        source = self.camera
+        if AUTO_ROI_PAD is not None and self.camera.get_roi_constraints() is not None:
+            source = AutoRoiCamera(self.camera, pad=AUTO_ROI_PAD)
+        source, self.recorder = start_recording(source, getattr(self.camera, 'serial', None))
+        self.pipeline = FramePipeline(source, self.detector, PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        self.pipeline.start()
+        self.start_metrics()
+        self.timer.start(30)
+        self.metrics_timer.start(METRICS_PANEL_INTERVAL_MS)
+
+    def start_metrics(self):
+        # Each exporter on its own, a port in use must not also stop the log
+        from metrics import MetricsServer, JsonMetricsLog
+        if METRICS_PORT is not None:
+            try:
+                self.metrics_server = MetricsServer(self.pipeline, port=METRICS_PORT)
+                self.metrics_server.start()
+            except Exception as e:
+                self.metrics_server = None
+                print(f"Failed to start the metrics server on port {METRICS_PORT}: {e}")
+        if METRICS_LOG_FILE is not None:
+            try:
+                self.metrics_log = JsonMetricsLog(self.pipeline, path=METRICS_LOG_FILE)
+                self.metrics_log.start()
+            except Exception as e:
+                self.metrics_log = None
+                print(f"Failed to start the metrics log {METRICS_LOG_FILE}: {e}")
+
+    def update_frame(self):
+        result = self.pipeline.latest_result()
+        if result is None:
             return
-        
-        # if not self.camera.mode_setting():
-        #     self.video_stream_widget.camera_status_label.setText('Camera Status: mode setting error')
-        #     return
 
-        if not self.camera.config_image():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: config error')
+        t0 = time.perf_counter()
+        try:
+            #gray images, resized once and drawn on at preview size
+            self.video_stream_widget.image_label.setPixmap(self.frame_display.render(result['frame'], result))
+        except Exception as e:
+            self.pipeline.exceptions['display'] += 1
+            print(f"Display failed: {e}")
             return
+        self.pipeline.record_display(time.perf_counter() - t0)
+        if 'first_frame_s' not in self.startup:
+            self.record_startup('first_frame_s')
 
-        if not self.camera.alloc_and_announce_buffers():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: alloc and announce buffer error')
+        if result['ink_angle'] is not None:
+            self.video_stream_widget.ink_angle_label.setText(f"Ink angle: {result['ink_angle']:.2f}")
+        else:
+            self.video_stream_widget.ink_angle_label.setText('Ink angle: None')
+
+    def update_metrics_panel(self):
+        # settings.ini was edited outside the app, show what is in use now (not while the page is being edited)
+        params = self.param_store.current
+        if params.version != self.shown_params_version and self.stacked_widget.currentWidget() is not self.settings_widget:
+            self.show_parameters(params)
+
+        stats = self.pipeline.stats()
+        rows = [f"{'stage':<8} {'fps':>6} {'mean ms':>8} {'max ms':>8} {'errors':>6}"]
+        for stage in ('capture', 'process', 'display'):
+            rows.append(f"{stage:<8} {stats['fps'][stage]:>6.1f} {stats[stage]['mean_ms']:>8.1f} "
+                        f"{stats[stage]['max_ms']:>8.1f} {stats['exceptions'][stage]:>6}")
+        rows.append(f"queues   frame {stats['frame_queue']['depth']} (dropped {stats['frame_queue']['dropped']}), "
+                    f"result {stats['result_queue']['depth']} (dropped {stats['result_queue']['dropped']})")
+        rows.append(f"capture copy {getattr(self.pipeline.camera, 'bytes_copied', 0) / 1024:.0f} KB/frame, "
+                    f"display copy {self.frame_display.bytes_copied / 1024:.0f} KB/frame")
+        if self.scene_cache is not None:
+            cache = self.scene_cache.stats()
+            rows.append(f"scene cache {cache['hits']} hits, {cache['misses']} detections ({cache['hit_rate']:.0%} reused)")
+        self.video_stream_widget.metrics_label.setText('\n'.join(rows))
+
+        camera_stats = stats.get('camera', {})
+        self.video_stream_widget.camera_status_label.setText(
+            f"Camera Status: Ready (dropped {camera_stats.get('dropped')}, "
+            f"incomplete {camera_stats.get('incomplete')}, late {camera_stats.get('late')})")
+
+    def record_startup(self, milestone):
+        """ Store a startup milestone. The first frame completes the record, which is printed and logged. """
+        self.startup[milestone] = time.perf_counter() - STARTUP_T0
+        if milestone != 'first_frame_s':
             return
-        
-        if not self.camera.start_acquisition():
-            self.video_stream_widget.camera_status_label.setText('Camera Status: start acquisition error')
+        print('Startup: ' + ', '.join(f"{key} {value:.3f}" for key, value in self.startup.items()))
+        if STARTUP_LOG_FILE is None:
             return
-        
-        self.video_stream_widget.camera_status_label.setText('Camera Status: Ready')
+        try:
+            with open(STARTUP_LOG_FILE, 'a') as f:
+                f.write(json.dumps(dict(self.startup, time=time.time(), backend=CAMERA_BACKEND)) + '\n')
+        except OSError as e:
+            print(f"Failed to write {STARTUP_LOG_FILE}: {e}")
+
+    def closeEvent(self, event):
+        self._closing = True
+        self.timer.stop()
+        self.metrics_timer.stop()
+        self.settings_watcher.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.metrics_log is not None:
+            self.metrics_log.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.camera is not None:
+            self.camera.dispose()
+
+class CameraDiscovery(QObject):
+    """ Runs list_camera_serials() on a worker thread. """
+    found = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def start(self):
+        threading.Thread(target=self._run, name='camera-discovery', daemon=True).start()
+
+    def _run(self):
+        try:
+            self.found.emit(list_camera_serials())
+        except Exception as e:
+            print(f"Camera discovery failed: {e}")
+            self.failed.emit(str(e))
+
+class CameraTile(QFrame):
+    """ One camera of the multi-camera view: preview, angle and status lines. """
+    def __init__(self, serial):
+        super().__init__()
+        self.setFrameShape(QFrame.Box)
+        self.setStyleSheet("CameraTile { border: 2px solid #4CAF50; }")
+
+        self.title_label = QLabel(f'Camera {serial}')
+        self.title_label.setFont(QFont("Arial", 11, QFont.Bold))
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.ink_angle_label = QLabel('Ink angle: None')
+        self.status_label = QLabel('Camera Status: Waiting')
+        self.throughput_label = QLabel('-')
+        self.throughput_label.setFont(QFont("Courier", 9))
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.title_label)
+        layout.addWidget(self.image_label, 1)
+        layout.addWidget(self.ink_angle_label)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.throughput_label)
+        self.setLayout(layout)
+
+class MultiCameraWindow(QWidget):
+    """ Tiled view of several cameras sharing one CameraManager detection pool. """
+    def __init__(self):
+        super().__init__()
+
+        # One parameter set for every camera, following settings.ini
+        self.param_store = ParameterStore()
+        try:
+            self.param_store.load(CONFIG_FILE)
+        except Exception as e:
+            print(f"Failed to load settings: {e}")
+        self.settings_watcher = SettingsWatcher(self.param_store, CONFIG_FILE, SETTINGS_POLL_INTERVAL)
+        self.settings_watcher.start()
+
+        self.manager = CameraManager(DETECTION_WORKERS, PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        self.cameras = {}
+        self.recorders = {}
+        self.tiles = {}
+        self.displays = {}
+        self.starters = []
+        self._closing = False
+
+        self.pool_label = QLabel('Detection pool: discovering cameras')
+        self.pool_label.setFont(QFont("Courier", 9))
+        self.grid = QGridLayout()
+        layout = QVBoxLayout()
+        layout.addWidget(self.pool_label)
+        layout.addLayout(self.grid, 1)
+        self.setLayout(layout)
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_frames)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.update_metrics_panel)
+
+        self.manager.start()
+        self.discovery = CameraDiscovery()
+        self.discovery.found.connect(self.run_cameras)
+        self.discovery.failed.connect(lambda error: self.pool_label.setText(f'Camera discovery failed: {error}'))
+        self.discovery.start()
+
+    def run_cameras(self, serials):
+        if not serials:
+            self.pool_label.setText('Detection pool: no cameras found')
+            return
+        columns = max(1, int(len(serials) ** 0.5 + 0.999))
+        for index, serial in enumerate(serials):
+            tile = CameraTile(serial)
+            self.tiles[serial] = tile
+            self.grid.addWidget(tile, index // columns, index % columns)
+
+            starter = CameraStarter(serial)
+            starter.progress.connect(tile.status_label.setText)
+            starter.finished.connect(lambda camera, status, ok, serial=serial: self.on_camera_started(serial, camera, status, ok))
+            starter.start()
+            self.starters.append(starter)
         self.timer.start(30)
+        self.metrics_timer.start(METRICS_PANEL_INTERVAL_MS)
 
-    def update_frame(self):
-        #gray images
-        img = self.camera.capture_frame()
-        # print(img.shape)
-        width = img.shape[1]
-        height = img.shape[0]
-        # gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        img_bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-
-        circles = self.img_processing.detect_circle(img, img.shape[0]/8)
-        mask = np.zeros_like(img)
-        _center = None
-        _radius = None
-        # print(len(circles[0]))
-        if len(circles[0]) == 1:
-            circles = np.uint16(np.around(circles))
-            for i in circles[0, :]:
-                _center = (i[0], i[1])
-                _radius = i[2]
-                cv2.circle(img_bgr, _center, 1, (0, 100, 100), 3)
-                cv2.circle(img_bgr, _center, _radius, (255, 0, 255), 3)
-                cv2.circle(mask, _center, _radius, (255, 0, 255), -1)
-            
-            masked_image = cv2.bitwise_and(img, mask)
-            edges = self.img_processing.canny(masked_image)
-            # lines = self.img_processing.detect_lines_p(edges, th=90)
-            lines = self.img_processing.detect_lines(edges, th=90)
-            if(lines is not None):
-                clusters = self.img_processing.group_lines(lines, angle_threshold=5, dist_threshold=100)
-                averaged_lines = [self.img_processing.average_line(cluster) for cluster in clusters]
-                closest_line = min(averaged_lines, key=lambda line: self.img_processing.distance_from_center(line, _center))
-                # x1, y1, x2, y2 = closest_line[0]
-                ink_angle = self.img_processing.calculate_angle_from_axis2(closest_line)
-                img_bgr = self.img_processing.draw_line_through_circle(img_bgr, center=_center, radius=_radius+30, angle_degrees=ink_angle)
-        elif len(circles[0]) > 1:
-            pass
-        else:
-            pass
-        
-        
+    def on_camera_started(self, serial, camera, status, ok):
+        self.tiles[serial].status_label.setText(status)
+        if camera is None:
+            return
+        if self._closing:
+            camera.dispose()
+            return
+        self.cameras[serial] = camera
+        if not ok:
+            return
 
-        
-        img_resize = self.img_processing.resize(img_bgr)
-        
-        bytes_per_line = 3 * img_resize.shape[1]
-        q_img = QImage(img_resize.data, img_resize.shape[1], img_resize.shape[0], bytes_per_line, QImage.Format_RGB888)
-        self.video_stream_widget.image_label.setPixmap(QPixmap.fromImage(q_img))
+        source = camera
+        if AUTO_ROI_PAD is not None and camera.get_roi_constraints() is not None:
+            source = AutoRoiCamera(camera, pad=AUTO_ROI_PAD)
+        source, recorder = start_recording(source, serial)
+        if recorder is not None:
+            self.recorders[serial] = recorder
+        imgpr = Imgpr(track_circle=TRACK_CIRCLE, params=self.param_store)
+        self.displays[serial] = FrameDisplay(imgpr, scale=MULTI_CAMERA_PREVIEW_SCALE)
+        processor = SceneCache(imgpr, **SCENE_CACHE) if SCENE_CACHE is not None else imgpr
+        self.manager.add(serial, source, StatefulDetector(processor, detect_every=DETECT_EVERY_N_FRAMES))
+
+    def update_frames(self):
+        for serial, result in self.manager.latest_results().items():
+            if result is None:
+                continue
+            tile = self.tiles[serial]
+            pipeline = self.manager.pipelines.get(serial)
+            t0 = time.perf_counter()
+            try:
+                tile.image_label.setPixmap(self.displays[serial].render(result['frame'], result))
+            except Exception as e:
+                pipeline.exceptions['display'] += 1
+                print(f"Display failed for camera {serial}: {e}")
+                continue
+            pipeline.record_display(time.perf_counter() - t0)
+
+            if result['ink_angle'] is not None:
+                tile.ink_angle_label.setText(f"Ink angle: {result['ink_angle']:.2f}")
+            else:
+                tile.ink_angle_label.setText('Ink angle: None')
+
+    def update_metrics_panel(self):
+        stats = self.manager.stats()
+        self.pool_label.setText(f"Detection pool: {stats['workers']} workers, {stats['process_fps']:.1f} frames/s, "
+                                f"{len(stats['cameras'])}/{len(self.tiles)} cameras running")
+        for serial, camera_stats in stats['cameras'].items():
+            tile = self.tiles[serial]
+            fps = camera_stats['fps']
+            errors = sum(camera_stats['exceptions'].values())
+            tile.throughput_label.setText(
+                f"capture {fps['capture']:5.1f} fps  process {fps['process']:5.1f} fps  {camera_stats['process']['mean_ms']:5.1f} ms\n"
+                f"queue dropped {camera_stats['frame_queue']['dropped']}  errors {errors}")
+            device = camera_stats.get('camera', {})
+            tile.status_label.setText(
+                f"Camera Status: Ready (dropped {device.get('dropped')}, "
+                f"incomplete {device.get('incomplete')}, late {device.get('late')})")
 
     def closeEvent(self, event):
-        self.camera.dispose()
+        self._closing = True
+        self.timer.stop()
+        self.metrics_timer.stop()
+        self.settings_watcher.stop()
+        self.manager.stop()
+        for recorder in self.recorders.values():
+            recorder.close()
+        for camera in self.cameras.values():
+            camera.dispose()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = MainWindow()
-    window.setWindowTitle('Modern UI Camera Stream with Detection')
+    if CAMERA_SERIALS:
+        window = MultiCameraWindow()
+        window.setWindowTitle('Multi-Camera Stream with Detection')
+    else:
+        window = MainWindow()
+        window.setWindowTitle('Modern UI Camera Stream with Detection')
+        window.startup['window_s'] = time.perf_counter() - STARTUP_T0
     window.show()
     sys.exit(app.exec_())
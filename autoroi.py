@@ -0,0 +1,98 @@
+import threading
+
+
+def align_roi(center, radius, pad, constraints):
+    """ Padded box around a circle, aligned to the camera's ROI steps and clamped to the sensor. """
+    c = constraints
+    half = radius + pad
+    x = int(center[0] - half)
+    y = int(center[1] - half)
+    width = int(2 * half)
+    height = int(2 * half)
+
+    # Offsets round down, sizes round up, so the box never shrinks
+    x = max(x - x % c['inc_x'], 0)
+    y = max(y - y % c['inc_y'], 0)
+    width = max(-(-width // c['inc_width']) * c['inc_width'], c['min_width'])
+    height = max(-(-height // c['inc_height']) * c['inc_height'], c['min_height'])
+    width = min(width, c['sensor_width'] - c['sensor_width'] % c['inc_width'])
+    height = min(height, c['sensor_height'] - c['sensor_height'] % c['inc_height'])
+
+    # Slide back inside the sensor keeping the alignment
+    x = min(x, c['sensor_width'] - width)
+    y = min(y, c['sensor_height'] - height)
+    x -= x % c['inc_x']
+    y -= y % c['inc_y']
+    return x, y, width, height
+
+
+class AutoRoiCamera():
+    """ Camera wrapper that shrinks the sensor ROI to the detected disc.
+
+    Sits between IDSCamera and FramePipeline. The first full-frame
+    detection sets a padded, aligned ROI around the disc. Each frame then
+    carries its ROI offset (frame_offset), and the pipeline maps results
+    back to sensor coordinates and reports them through on_result(). The
+    ROI is re-centred when the disc drifts within `pad / 2` of the ROI edge
+    and goes back to full frame after `lost_frames` misses in a row. ROI
+    changes are applied in the capture thread between two captures.
+    """
+
+    def __init__(self, camera, pad=40, lost_frames=3):
+        self.camera = camera
+        self.pad = pad
+        self.lost_frames = lost_frames
+        self.constraints = camera.get_roi_constraints()
+        self.roi = camera.get_roi()
+        self.frame_offset = (self.roi[0], self.roi[1]) if self.roi else (0, 0)
+        self.roi_changes = 0
+        self._misses = 0
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def full_roi(self):
+        c = self.constraints
+        return 0, 0, c['sensor_width'], c['sensor_height']
+
+    def capture_frame(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = None
+        if pending is not None and pending != self.roi:
+            if self.camera.change_roi(*pending):
+                self.roi = pending
+                self.roi_changes += 1
+            else:
+                # Rejected: read back whatever the camera is using now
+                self.roi = self.camera.get_roi() or self.roi
+        if self.roi is not None:
+            self.frame_offset = (self.roi[0], self.roi[1])
+        return self.camera.capture_frame()
+
+    def on_result(self, result):
+        """ Sensor-space process_frame result from the pipeline. """
+        if self.constraints is None or self.roi is None:
+            return
+
+        if result['center'] is None:
+            self._misses += 1
+            if self._misses >= self.lost_frames and self.roi != self.full_roi():
+                self._request(self.full_roi())
+            return
+        self._misses = 0
+
+        (cx, cy), radius = result['center'], result['radius']
+        x, y, width, height = self.roi
+        margin = radius + self.pad / 2
+        inside = (cx - margin >= x and cy - margin >= y and cx + margin <= x + width and cy + margin <= y + height)
+        too_big = width > 2 * (radius + 2 * self.pad) or height > 2 * (radius + 2 * self.pad)
+        if not inside or too_big:
+            self._request(align_roi((cx, cy), radius, self.pad, self.constraints))
+
+    def _request(self, roi):
+        with self._lock:
+            self._pending = roi
+
+    def __getattr__(self, name):
+        # Everything else (statistics, dispose, ...) goes to the wrapped camera
+        return getattr(self.camera, name)
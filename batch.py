@@ -0,0 +1,158 @@
+""" Headless batch measurement of archived images and videos.
+
+Usage: python batch.py images/ clip.avi --output results.csv [--workers N]
+
+Runs Imgpr.process_frame on every image and video frame found and writes
+one row per frame (circle, ink angle, processing time) to CSV or Parquet.
+Only needs numpy and OpenCV; Qt and ids_peak are not imported.
+"""
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import time
+
+import cv2
+
+from impl import Imgpr
+from camera_base import IMAGE_EXTENSIONS
+from engine import DetectionEngine
+from params import ANGLE_METHODS
+
+VIDEO_EXTENSIONS = ('.avi', '.mp4', '.mkv', '.mov')
+
+FIELDS = ['source', 'frame_index', 'center_x', 'center_y', 'radius', 'ink_angle', 'process_ms']
+
+_worker_imgpr = None
+
+
+def _init_worker(angle_method):
+    global _worker_imgpr
+    _worker_imgpr = Imgpr(angle_method=angle_method)
+
+
+def _process_image(path):
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return path, None
+    t0 = time.perf_counter()
+    result = _worker_imgpr.process_frame(img)
+    result['process_ms'] = (time.perf_counter() - t0) * 1000
+    return path, result
+
+
+def collect_inputs(paths):
+    """ Split the given files and directories into sorted image and video lists. """
+    images = []
+    videos = []
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+        for file in files:
+            ext = os.path.splitext(file)[1].lower()
+            if ext in IMAGE_EXTENSIONS:
+                images.append(file)
+            elif ext in VIDEO_EXTENSIONS:
+                videos.append(file)
+    return sorted(images), sorted(videos)
+
+
+def video_frames(path):
+    """ Yield gray frames from a video file. """
+    cap = cv2.VideoCapture(path)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            yield frame
+    finally:
+        cap.release()
+
+
+def to_row(source, frame_index, result):
+    center = result['center'] or (None, None)
+    return {
+        'source': source,
+        'frame_index': frame_index,
+        'center_x': center[0],
+        'center_y': center[1],
+        'radius': result['radius'],
+        'ink_angle': result['ink_angle'],
+        'process_ms': result['process_ms'],
+    }
+
+
+def run_batch(paths, workers=None, angle_method='hough'):
+    """ Yield one row dict per processed frame. Images are read and processed in the pool. """
+    workers = workers or os.cpu_count() or 1
+    images, videos = collect_inputs(paths)
+
+    if images:
+        with mp.Pool(workers, initializer=_init_worker, initargs=(angle_method,)) as pool:
+            for path, result in pool.imap(_process_image, images, chunksize=4):
+                if result is None:
+                    print(f"Failed to read {path}")
+                    continue
+                yield to_row(path, 0, result)
+
+    for path in videos:
+        frames = video_frames(path)
+        first = next(frames, None)
+        if first is None:
+            print(f"Failed to read {path}")
+            continue
+        with DetectionEngine(first.shape, first.dtype, workers=workers, angle_method=angle_method) as engine:
+            def all_frames():
+                yield first
+                yield from frames
+            for index, result in enumerate(engine.map(all_frames())):
+                yield to_row(path, index, result)
+
+
+def write_csv(rows, output):
+    count = 0
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(rows, output):
+    try:
+        import pandas as pd
+    except ImportError:
+        raise RuntimeError("Parquet output needs pandas and pyarrow installed, use a .csv output instead")
+    frame = pd.DataFrame(list(rows), columns=FIELDS)
+    frame.to_parquet(output, index=False)
+    return len(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='image/video files or directories')
+    parser.add_argument('--output', default='results.csv', help='.csv or .parquet file')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--angle-method', default='hough', choices=ANGLE_METHODS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    rows = run_batch(args.inputs, args.workers, args.angle_method)
+    if args.output.lower().endswith('.parquet'):
+        count = write_parquet(rows, args.output)
+    else:
+        count = write_csv(rows, args.output)
+    elapsed = time.perf_counter() - t0
+
+    fps = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} frames in {elapsed:.2f} s ({fps:.1f} FPS) -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
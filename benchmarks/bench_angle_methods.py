@@ -0,0 +1,141 @@
+""" Speed and accuracy of the ink angle backends on a known disc.
+
+Usage: python benchmarks/bench_angle_methods.py [--noise 0 2 4] [--repeat N] [--samples images/OnlyPolarize.png]
+
+The circle is found once per frame outside the timed region, so only the
+angle stage of each backend is compared. The '+refine' rows add
+Imgpr.refine_line after the Hough answer, as process_frame does with
+refine_band > 0.
+
+The sample images have no known angle; for them the coarse Hough angle
+is listed next to the refined one. A refinement that turns the angle by
+more than refine_ink_angle's max_turn yet still reports a standard error
+is flagged, the fit must fall back to the Hough angle there.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from params import ParameterStore
+from synthetic import make_disc_frame, angle_error
+
+ANGLES = [0.0, 8.5, 17.0, 45.0, 90.0, 133.3, 171.0]
+SAMPLES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images', 'OnlyPolarize.png')]
+# refine_ink_angle's default max_turn
+MAX_TURN = 1.0
+
+
+def angle_hough(imgpr, img, center, radius):
+    mask = np.zeros_like(img)
+    cv2.circle(mask, center, radius, 255, -1)
+    lines = imgpr.detect_lines(imgpr.canny(cv2.bitwise_and(img, mask)), th=90)
+    if lines is None:
+        return None
+    clusters = imgpr.group_lines_fast(lines, angle_threshold=5, dist_threshold=100)
+    averaged_lines = [imgpr.average_line(cluster) for cluster in clusters]
+    closest_line = min(averaged_lines, key=lambda line: imgpr.distance_from_center(line, center))
+    return imgpr.calculate_angle_from_axis2(closest_line)
+
+
+def angle_hough_polar(imgpr, img, center, radius):
+    mask = np.zeros_like(img)
+    cv2.circle(mask, center, radius, 255, -1)
+    return imgpr.ink_angle_polar(imgpr.canny(cv2.bitwise_and(img, mask)), center, th=90)
+
+
+def angle_orientation(imgpr, img, center, radius):
+    return imgpr.ink_angle_orientation(img, center, radius)[0]
+
+
+def angle_hough_refined(imgpr, img, center, radius):
+    mask = np.zeros_like(img)
+    cv2.circle(mask, center, radius, 255, -1)
+    edges = imgpr.canny(cv2.bitwise_and(img, mask))
+    line = imgpr.ink_line(edges, center)
+    if line is None:
+        return None
+    return imgpr.refine_line(edges, center, radius, line)[0]
+
+
+def angle_hough_polar_refined(imgpr, img, center, radius):
+    mask = np.zeros_like(img)
+    cv2.circle(mask, center, radius, 255, -1)
+    edges = imgpr.canny(cv2.bitwise_and(img, mask))
+    line = imgpr.ink_line_polar(edges, center)
+    if line is None:
+        return None
+    return imgpr.refine_line(edges, center, radius, line, polar=True)[0]
+
+
+def check_samples(paths):
+    """ Coarse and refined process_frame angle per Hough backend on real images. """
+    print(f"\n{'sample':<20} {'method':<12} {'coarse':>8} {'refined':>8} {'std':>7}")
+    for path in paths:
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        for method in ('hough', 'hough_polar'):
+            coarse_store = ParameterStore()
+            coarse_store.update(angle_method=method, refine_band=0)
+            store = ParameterStore()
+            store.update(angle_method=method)
+            coarse = Imgpr(params=coarse_store).process_frame(img)['ink_angle']
+            result = Imgpr(params=store).process_frame(img)
+            if coarse is None or result['ink_angle'] is None:
+                print(f"{os.path.basename(path):<20} {method:<12} {'missed':>8}")
+                continue
+            std = result.get('ink_angle_std')
+            flag = '  BAD FIT KEPT' if std is not None and angle_error(result['ink_angle'], coarse) > MAX_TURN else ''
+            print(f"{os.path.basename(path):<20} {method:<12} {coarse:>8.3f} {result['ink_angle']:>8.3f} "
+                  f"{std if std is not None else float('nan'):>7.3f}{flag}")
+
+
+METHODS = {'hough': angle_hough, 'hough+refine': angle_hough_refined, 'hough_polar': angle_hough_polar,
+           'polar+refine': angle_hough_polar_refined, 'orientation': angle_orientation}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 2.0, 4.0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--samples', nargs='*', default=SAMPLES, help='real images to check the refinement on')
+    args = parser.parse_args()
+
+    imgpr = Imgpr()
+    rng = np.random.default_rng(0)
+    print(f"{'method':<12} {'noise':>5} {'mean ms':>8} {'mean err':>9} {'max err':>8} {'missed':>6}")
+    for noise in args.noise:
+        cases = []
+        for angle in ANGLES:
+            img = make_disc_frame(angle=angle, noise=noise, rng=rng)
+            circle = imgpr.find_circle(img)
+            if circle is not None:
+                cases.append((img, circle, angle))
+
+        for name, method in METHODS.items():
+            times = []
+            errors = []
+            missed = 0
+            for img, (center, radius), truth in cases:
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    angle = method(imgpr, img, center, radius)
+                    times.append(time.perf_counter() - t0)
+                if angle is None:
+                    missed += 1
+                else:
+                    errors.append(angle_error(angle, truth))
+            print(f"{name:<12} {noise:>5g} {np.mean(times)*1000:>8.2f} "
+                  f"{np.mean(errors) if errors else float('nan'):>9.3f} {np.max(errors) if errors else float('nan'):>8.3f} {missed:>6}")
+
+    if args.samples:
+        check_samples(args.samples)
+
+
+if __name__ == '__main__':
+    main()
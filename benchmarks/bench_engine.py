@@ -0,0 +1,57 @@
+""" Frames-per-second of DetectionEngine against the serial Imgpr path.
+
+Usage: python benchmarks/bench_engine.py [--frames N] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from engine import DetectionEngine
+
+IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images', 'intensity.png')
+
+
+def bench_serial(frames):
+    imgpr = Imgpr()
+    t0 = time.perf_counter()
+    results = [imgpr.process_frame(frame) for frame in frames]
+    return results, time.perf_counter() - t0
+
+
+def bench_engine(frames, workers):
+    with DetectionEngine(frames[0].shape, frames[0].dtype, workers=workers) as engine:
+        # Warm up the pool so worker start-up is not timed
+        list(engine.map(frames[:engine.workers]))
+        t0 = time.perf_counter()
+        results = list(engine.map(frames))
+        return results, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    img = cv2.imread(IMAGE, cv2.IMREAD_GRAYSCALE)
+    frames = [img] * args.frames
+
+    serial_results, serial_time = bench_serial(frames)
+    engine_results, engine_time = bench_engine(frames, args.workers)
+
+    print(f"frames: {args.frames}, shape: {img.shape}, workers: {args.workers or os.cpu_count()}")
+    print(f"serial: {args.frames / serial_time:8.1f} FPS")
+    print(f"engine: {args.frames / engine_time:8.1f} FPS ({serial_time / engine_time:.2f}x)")
+    for result in engine_results:
+        result.pop('process_ms')
+    print(f"results match: {serial_results == engine_results}")
+
+
+if __name__ == '__main__':
+    main()
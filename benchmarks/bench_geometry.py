@@ -0,0 +1,119 @@
+""" Per-line scalar geometry against the batched Imgpr array methods.
+
+Usage: python benchmarks/bench_geometry.py [--sizes 10 100 1000 5000] [--repeat N]
+
+The scalar references are the per-line math.* versions the Imgpr helpers
+used before they became wrappers over the array methods. Each row times
+one step over N HoughLines-like lines and checks both give the same output.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr, HOUGH_THETA, HOUGH_THETA_STEP
+
+CENTER = (608, 512)
+
+
+def scalar_endpoints(lines):
+    output = []
+    for rho, theta in lines:
+        a = np.cos(theta)
+        b = np.sin(theta)
+        x0 = a*rho
+        y0 = b*rho
+        output.append([(int(x0 + 1000*(-b)), int(y0 + 1000*(a)), int(x0 - 1000*(-b)), int(y0 - 1000*(a)))])
+    return output
+
+
+def scalar_params(lines):
+    out = []
+    for line in lines:
+        x1, y1, x2, y2 = line[0]
+        if x2 - x1 != 0:
+            m = (y2 - y1) / (x2 - x1)
+            out.append((m, y1 - m * x1))
+        else:
+            out.append((np.inf, x1))
+    return out
+
+
+def scalar_distances(lines):
+    out = []
+    for line in lines:
+        x1, y1, x2, y2 = line[0]
+        out.append(math.sqrt(((x1 + x2) / 2 - CENTER[0]) ** 2 + ((y1 + y2) / 2 - CENTER[1]) ** 2))
+    return out
+
+
+def scalar_angles2(lines):
+    out = []
+    for line in lines:
+        x1, y1, x2, y2 = line[0]
+        angle = math.degrees(math.atan2(y2 - y1, x2 - x1))
+        out.append(angle + 180 if angle < 0 else angle)
+    return out
+
+
+def scalar_circle_lines(angles):
+    out = []
+    for angle in angles:
+        r = math.radians(angle)
+        out.append((int(CENTER[0] + 430 * math.cos(r)), int(CENTER[1] + 430 * math.sin(r)),
+                    int(CENTER[0] - 430 * math.cos(r)), int(CENTER[1] - 430 * math.sin(r))))
+    return out
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    imgpr = Imgpr()
+    rng = np.random.default_rng(args.seed)
+    print(f"{'step':<14} {'lines':>6} {'scalar us':>10} {'batched us':>11} {'speedup':>8}")
+    for n in args.sizes:
+        # HoughLines output: float32 rho, theta on the 1 degree grid
+        polar = np.column_stack((rng.uniform(-800, 800, n), HOUGH_THETA[rng.integers(0, 180, n)])).astype(np.float32)
+        lines = imgpr.polar_to_endpoints(polar).reshape(-1, 1, 4)
+        angles = rng.uniform(0, 180, n)
+
+        steps = [
+            ('endpoints', lambda: scalar_endpoints(polar),
+             lambda: imgpr.polar_to_endpoints(polar, theta_step=HOUGH_THETA_STEP),
+             lambda a, b: np.array_equal(np.array(a).reshape(-1, 4), b)),
+            ('params', lambda: scalar_params(lines), lambda: imgpr.lines_to_params(lines),
+             lambda a, b: np.allclose(np.array(a).T, np.array(b))),
+            ('distances', lambda: scalar_distances(lines), lambda: imgpr.distances_from_center(lines, CENTER),
+             lambda a, b: np.allclose(a, b)),
+            ('angles2', lambda: scalar_angles2(lines), lambda: imgpr.angles_from_axis2(lines),
+             lambda a, b: np.allclose(a, b)),
+            ('circle lines', lambda: scalar_circle_lines(angles), lambda: imgpr.lines_through_circle(CENTER, 430, angles),
+             lambda a, b: np.array_equal(np.array(a), b)),
+        ]
+        for name, scalar, batched, same in steps:
+            t_scalar, ref = best_time(scalar, args.repeat)
+            t_batched, out = best_time(batched, args.repeat)
+            flag = '' if same(ref, out) else '  MISMATCH'
+            print(f"{name:<14} {n:>6} {t_scalar * 1e6:>10.1f} {t_batched * 1e6:>11.1f} {t_scalar / t_batched:>7.1f}x{flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+""" Imgpr.group_lines against Imgpr.group_lines_fast for 10 to 5000 lines.
+
+Usage: python benchmarks/bench_group_lines.py [--sizes 10 100 1000 5000] [--seed N]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+
+
+def make_lines(n, rng):
+    """ HoughLines-like output around a few dominant lines, as detect_lines endpoints. """
+    base = rng.uniform(0, np.pi, size=6)
+    theta = rng.choice(base, size=n) + rng.normal(0, np.pi/180, size=n)
+    theta[rng.random(n) < 0.05] = 0.0  # some vertical lines
+    rho = rng.normal(0, 150, size=n)
+
+    lines = []
+    for r, t in zip(rho, theta):
+        a, b = np.cos(t), np.sin(t)
+        x0, y0 = a*r + 600, b*r + 500
+        lines.append([(int(x0 + 1000*(-b)), int(y0 + 1000*a), int(x0 - 1000*(-b)), int(y0 - 1000*a))])
+    return lines
+
+
+def same_clusters(a, b):
+    if len(a) != len(b):
+        return False
+    for ca, cb in zip(a, b):
+        if ca['lines'] != cb['lines']:
+            return False
+        if not (np.isclose(ca['avg_m'], cb['avg_m'], equal_nan=True) and np.isclose(ca['avg_c'], cb['avg_c'])):
+            return False
+    return True
+
+
+def timed(func, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = func(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 100, 500, 1000, 5000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    imgpr = Imgpr()
+    rng = np.random.default_rng(args.seed)
+    print(f"{'lines':>6} {'clusters':>8} {'group_lines ms':>15} {'fast ms':>9} {'speedup':>8} same")
+    for n in args.sizes:
+        lines = make_lines(n, rng)
+        ref, ref_time = timed(imgpr.group_lines, lines, angle_threshold=5, dist_threshold=100)
+        fast, fast_time = timed(imgpr.group_lines_fast, lines, angle_threshold=5, dist_threshold=100)
+        print(f"{n:>6} {len(ref):>8} {ref_time*1000:>15.2f} {fast_time*1000:>9.2f} {ref_time/fast_time:>7.1f}x {same_clusters(ref, fast)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+""" Per-stage timing and angle accuracy of Imgpr.process_frame, headless.
+
+Usage: python benchmarks/bench_pipeline.py [--repeat N] [--angle-method hough] [--output results.json]
+
+Runs every images/*.png plus synthetic discs with known ink angles at
+several resolutions and noise levels through Imgpr.process_frame, with
+the default DetectionParams (refinement included). The Imgpr methods it
+calls are wrapped with timers, so each stage (detect_circle, canny,
+detect_lines, group_lines, average_line, refine) is timed inside the
+real call; 'other' is the rest of process_frame (masking, picking the
+closest line, angle). The synthetic disc radius and the HoughCircles
+radius range scale with the frame height, as a larger sensor behind the
+same optics would see it. The synthetic frames are scored against their
+ground-truth angle. Results are written as JSON so runs can be diffed.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from params import ANGLE_METHODS
+from synthetic import make_disc_frame, angle_error
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# Imgpr method -> stage it is timed under; both Hough paths share the stage names
+STAGE_METHODS = {
+    'find_circle': 'detect_circle',
+    'canny': 'canny',
+    'detect_lines': 'detect_lines',
+    'detect_lines_polar': 'detect_lines',
+    'group_lines_fast': 'group_lines',
+    'group_lines_polar': 'group_lines',
+    'average_line': 'average_line',
+    'refine_ink_angle': 'refine',
+}
+STAGES = ['detect_circle', 'canny', 'detect_lines', 'group_lines', 'average_line', 'refine', 'other']
+RESOLUTIONS = [(1216, 1024), (1600, 1200), (2048, 1536)]
+NOISE_LEVELS = [0.0, 2.0, 4.0]
+ANGLES = [0.0, 17.0, 45.0, 90.0, 133.3, 171.0]
+# Disc radius at the 1024 px base height, and the detection range around it (Imgpr.radius_range)
+BASE_HEIGHT = 1024
+BASE_RADIUS = 400
+BASE_RADIUS_RANGE = (300, 450)
+
+
+def instrumented_imgpr(angle_method, height=BASE_HEIGHT):
+    """ Imgpr whose stage methods add their run time to the returned dict, radius range scaled to the frame. """
+    imgpr = Imgpr(angle_method=angle_method)
+    scale = height / BASE_HEIGHT
+    imgpr.radius_range = (int(BASE_RADIUS_RANGE[0] * scale), int(BASE_RADIUS_RANGE[1] * scale))
+    times = dict.fromkeys(STAGES, 0.0)
+    for method, stage in STAGE_METHODS.items():
+        def timed(*args, _method=getattr(imgpr, method), _stage=stage, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                times[_stage] += time.perf_counter() - t0
+        setattr(imgpr, method, timed)
+    return imgpr, times
+
+
+def run_frame(imgpr, times, img):
+    """ One timed process_frame. Returns (ink_angle or None, total seconds, {stage: seconds}). """
+    for stage in times:
+        times[stage] = 0.0
+    t0 = time.perf_counter()
+    result = imgpr.process_frame(img)
+    total = time.perf_counter() - t0
+    stages = dict(times)
+    stages['other'] = max(total - sum(stages.values()), 0.0)
+    return result['ink_angle'], total, stages
+
+
+def make_cases():
+    """ (name, frame, ground-truth angle or None) for sample images and synthetic discs. """
+    cases = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'images', '*.png'))):
+        frame = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        cases.append({'name': os.path.basename(path), 'frame': frame, 'truth': None, 'height': BASE_HEIGHT})
+
+    rng = np.random.default_rng(0)
+    for width, height in RESOLUTIONS:
+        for noise in NOISE_LEVELS:
+            for angle in ANGLES:
+                frame = make_disc_frame(width, height, radius=BASE_RADIUS * height / BASE_HEIGHT, angle=angle,
+                                        noise=noise, rng=rng)
+                cases.append({'name': f'synthetic_{width}x{height}_n{noise:g}_a{angle:g}', 'frame': frame,
+                              'truth': angle, 'resolution': f'{width}x{height}', 'noise': noise, 'height': height})
+    return cases
+
+
+def summarize(values):
+    values = np.array(values) * 1000
+    return {'mean_ms': float(values.mean()), 'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--angle-method', default='hough', choices=[m for m in ANGLE_METHODS if m != 'orientation'])
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    imgprs = {}
+    results = []
+    for case in make_cases():
+        # One Imgpr per frame height, its workspace buffers stay warm as in the app
+        if case['height'] not in imgprs:
+            imgprs[case['height']] = instrumented_imgpr(args.angle_method, case['height'])
+        imgpr, times = imgprs[case['height']]
+        stage_times = {stage: [] for stage in STAGES}
+        totals = []
+        ink_angle = None
+        for _ in range(args.repeat):
+            ink_angle, total, stages = run_frame(imgpr, times, case['frame'])
+            totals.append(total)
+            for stage, seconds in stages.items():
+                stage_times[stage].append(seconds)
+
+        entry = {key: value for key, value in case.items() if key not in ('frame', 'height')}
+        entry['shape'] = list(case['frame'].shape)
+        entry['ink_angle'] = ink_angle
+        entry['error_deg'] = angle_error(ink_angle, case['truth']) if ink_angle is not None and case['truth'] is not None else None
+        entry['stages'] = {stage: summarize(values) for stage, values in stage_times.items()}
+        entry['total_ms'] = summarize(totals)['mean_ms']
+        results.append(entry)
+        print(f"{entry['name']:<36} total {entry['total_ms']:8.2f} ms  angle {ink_angle}  error {entry['error_deg']}")
+
+    synthetic = [r for r in results if r['truth'] is not None]
+    errors = [r['error_deg'] for r in synthetic if r['error_deg'] is not None]
+    summary = {
+        'frames': len(results),
+        'synthetic_detected': len(errors),
+        'synthetic_total': len(synthetic),
+        'mean_error_deg': float(np.mean(errors)) if errors else None,
+        'max_error_deg': float(np.max(errors)) if errors else None,
+        'stage_mean_ms': {stage: float(np.mean([r['stages'][stage]['mean_ms'] for r in results])) for stage in STAGES},
+    }
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'angle_method': args.angle_method,
+        'summary': summary,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(summary, indent=2))
+    print(f"wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
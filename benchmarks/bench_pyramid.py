@@ -0,0 +1,66 @@
+""" Accuracy and speed of the coarse-to-fine pyramid mode against single-scale detection.
+
+Usage: python benchmarks/bench_pyramid.py [--scales 4 8] [--noise 2]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from synthetic import make_disc_frame, angle_error
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ANGLES = [0.0, 17.0, 45.0, 90.0, 133.3, 171.0]
+RESOLUTIONS = [(1216, 1024), (1600, 1200), (2048, 1536)]
+
+
+def evaluate(imgpr, frames):
+    errors = []
+    times = []
+    missed = 0
+    for frame, truth in frames:
+        t0 = time.perf_counter()
+        result = imgpr.process_frame(frame)
+        times.append(time.perf_counter() - t0)
+        if result['ink_angle'] is None:
+            missed += 1
+        else:
+            errors.append(angle_error(result['ink_angle'], truth))
+    return errors, times, missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[4, 8])
+    parser.add_argument('--noise', type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [(make_disc_frame(w, h, angle=a, noise=args.noise, rng=rng), a) for w, h in RESOLUTIONS for a in ANGLES]
+    samples = [cv2.imread(path, cv2.IMREAD_GRAYSCALE) for path in sorted(glob.glob(os.path.join(ROOT, 'images', '*.png')))]
+
+    modes = [('single hough', Imgpr()), ('single hough_polar', Imgpr(angle_method='hough_polar'))]
+    modes += [(f'pyramid 1/{f}', Imgpr(pyramid_scale=f)) for f in args.scales]
+    reference = [Imgpr(angle_method='hough_polar').process_frame(img)['ink_angle'] for img in samples]
+
+    print(f"{'mode':<20} {'mean ms':>8} {'mean err':>9} {'max err':>8} {'missed':>6} {'samples vs polar':>17}")
+    for name, imgpr in modes:
+        errors, times, missed = evaluate(imgpr, frames)
+        agree = []
+        for img, ref in zip(samples, reference):
+            angle = imgpr.process_frame(img)['ink_angle']
+            if angle is not None and ref is not None:
+                agree.append(angle_error(angle, ref))
+        print(f"{name:<20} {np.mean(times)*1000:>8.2f} {np.mean(errors):>9.3f} {np.max(errors):>8.3f} {missed:>6} "
+              f"{np.median(agree) if agree else float('nan'):>13.3f} deg")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+""" Recorder throughput and replay speed at full sensor resolution.
+
+Usage: python benchmarks/bench_recording.py [--frames 250] [--fps 25 60] [--encoders 2] [--dir /tmp/paf_bench_rec]
+
+For each compression and capture rate a SimulatedCamera (noisy synthetic
+disc, 1216x1024) is recorded the way RecordingCamera does it in the
+capture thread: the 'capture' column is the time write() adds per frame and
+'dropped' the frames the writer could not keep up with. The recording is
+then replayed through ReplayCamera at maximum speed and checked against
+the captured frames.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from recording import FrameRecorder, ReplayCamera, COMPRESSIONS
+from sim_camera import SimulatedCamera
+
+
+def record(path, compression, frames, fps, encoders):
+    camera = SimulatedCamera(fps=fps, noise=3.0, rotation=0.5, seed=0)
+    camera.open_camera()
+    camera.start_acquisition()
+    recorder = FrameRecorder(path, compression, encoders=encoders).open()
+    captured = []
+    write_time = 0.0
+    t0 = time.perf_counter()
+    while len(captured) < frames:
+        frame = camera.capture_frame()
+        if frame is None:
+            continue
+        t1 = time.perf_counter()
+        recorder.write(frame, camera.last_timestamp_ns)
+        write_time += time.perf_counter() - t1
+        captured.append(frame)
+    elapsed = time.perf_counter() - t0
+    recorder.close()
+    camera.dispose()
+    return captured, elapsed, write_time / frames, recorder
+
+
+def replay(path, captured):
+    camera = ReplayCamera(path, speed=None, loop=False)
+    camera.open_camera()
+    camera.start_acquisition()
+    same = True
+    count = 0
+    t0 = time.perf_counter()
+    while True:
+        frame = camera.capture_frame()
+        if frame is None:
+            break
+        count += 1
+    elapsed = time.perf_counter() - t0
+
+    # Check outside the timed loop, recorded frame ids map back to the captured list
+    recording = camera.recording
+    for i in range(len(recording)):
+        same &= np.array_equal(recording.frame(i), captured[int(recording.index['frame_id'][i]) - 1])
+    camera.dispose()
+    return count, elapsed, same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=250)
+    parser.add_argument('--fps', type=float, nargs='+', default=[25, 60])
+    parser.add_argument('--encoders', type=int, default=2, help='PNG encoder threads')
+    parser.add_argument('--dir', default=None, help='where to write the recordings, a temporary directory by default')
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix='paf_bench_rec')
+    print(f"{'codec':<5} {'fps':>5} {'capture us':>10} {'dropped':>8} {'MB/frame':>9} {'replay fps':>11} {'equal':>6}")
+    try:
+        for compression in COMPRESSIONS:
+            for fps in args.fps:
+                path = os.path.join(directory, f'{compression}-{fps:g}')
+                captured, elapsed, write_s, recorder = record(path, compression, args.frames, fps, args.encoders)
+                count, replay_s, same = replay(path, captured)
+                stats = recorder.stats()
+                print(f"{compression:<5} {args.frames / elapsed:>5.1f} {write_s * 1e6:>10.1f} {stats['record_dropped']:>8} "
+                      f"{stats['record_bytes'] / max(stats['recorded'], 1) / 1e6:>9.3f} {count / replay_s:>11.0f} {str(same):>6}")
+    finally:
+        if args.dir is None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
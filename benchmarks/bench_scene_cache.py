@@ -0,0 +1,64 @@
+""" Detection cost and accuracy with and without the SceneCache gate.
+
+Usage: python benchmarks/bench_scene_cache.py [--frames 200] [--rotations 0 0.05 0.2 1] [--noise 3]
+
+Each row runs a noisy SimulatedCamera disc turning by `rotation` degrees
+per frame through Imgpr, once directly and once behind SceneCache, and
+reports the mean time per frame, the share of frames answered from the
+cache and the mean/max angle error against the simulator's true angle.
+Rotation 0 is the idle line; the others check that a turning part is
+not hidden by the cache.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from scene_cache import SceneCache
+from sim_camera import SimulatedCamera
+from synthetic import angle_error
+
+
+def run(processor, rotation, frames, noise):
+    camera = SimulatedCamera(fps=None, rotation=rotation, noise=noise, seed=0)
+    camera.open_camera()
+    camera.start_acquisition()
+    errors = []
+    elapsed = 0.0
+    for _ in range(frames):
+        frame = camera.capture_frame()
+        t0 = time.perf_counter()
+        result = processor.process_frame(frame)
+        elapsed += time.perf_counter() - t0
+        if result['ink_angle'] is not None:
+            errors.append(angle_error(result['ink_angle'], camera.truth_angle))
+    return elapsed / frames, np.array(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--rotations', type=float, nargs='+', default=[0, 0.05, 0.2, 1])
+    parser.add_argument('--noise', type=float, default=3.0)
+    parser.add_argument('--threshold', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'deg/frame':>9} {'mode':<7} {'ms/frame':>8} {'cached':>7} {'mean err':>9} {'max err':>8}")
+    for rotation in args.rotations:
+        for mode in ('direct', 'cached'):
+            processor = Imgpr(track_circle=True)
+            if mode == 'cached':
+                processor = SceneCache(processor, threshold=args.threshold)
+            seconds, errors = run(processor, rotation, args.frames, args.noise)
+            reused = f"{processor.stats()['hit_rate']:.0%}" if mode == 'cached' else '-'
+            print(f"{rotation:>9g} {mode:<7} {seconds * 1000:>8.2f} {reused:>7} "
+                  f"{errors.mean():>9.3f} {errors.max():>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+""" Startup time: module import cost and time to the first processed frame.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--output startup_bench.json]
+
+Each import is timed in a fresh interpreter, so nothing is cached by an
+earlier import. Time to first frame runs the app's headless chain
+(SimulatedCamera -> FramePipeline -> StatefulDetector) from a cold
+interpreter until the first result comes out. The GUI records the same
+milestones per launch in startup.jsonl (see app.STARTUP_LOG_FILE).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODULES = ['impl', 'pipeline', 'estimator', 'sim_camera', 'batch', 'app']
+
+IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import {module}
+print(time.perf_counter() - t0)
+"""
+
+FIRST_FRAME_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from impl import Imgpr
+from sim_camera import SimulatedCamera
+from pipeline import FramePipeline
+from estimator import StatefulDetector
+t_import = time.perf_counter()
+camera = SimulatedCamera(fps=60)
+camera.open_camera()
+camera.start_acquisition()
+pipeline = FramePipeline(camera, StatefulDetector(Imgpr(track_circle=True)))
+pipeline.start()
+while pipeline.latest_result() is None:
+    time.sleep(0.001)
+t_first = time.perf_counter()
+pipeline.stop()
+print(t_import - t0, t_first - t0)
+"""
+
+
+def run(snippet):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    out = subprocess.run([sys.executable, '-c', snippet], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return [float(value) for value in out.stdout.split()[-2:] if value]
+
+
+def summarize(values):
+    return {'median_ms': statistics.median(values) * 1000, 'min_ms': min(values) * 1000, 'max_ms': max(values) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='write the results as JSON')
+    args = parser.parse_args()
+
+    results = {'imports': {}}
+    for module in MODULES:
+        try:
+            times = [run(IMPORT_SNIPPET.format(module=module))[-1] for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<12} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        results['imports'][module] = summarize(times)
+        print(f"{module:<12} import {results['imports'][module]['median_ms']:8.1f} ms")
+
+    runs = [run(FIRST_FRAME_SNIPPET) for _ in range(args.repeat)]
+    results['first_frame'] = {'import': summarize([r[0] for r in runs]), 'first_frame': summarize([r[1] for r in runs])}
+    print(f"{'first frame':<12} {results['first_frame']['first_frame']['median_ms']:8.1f} ms "
+          f"(imports {results['first_frame']['import']['median_ms']:.1f} ms)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+""" Allocations and latency per frame of process_frame with and without the Workspace.
+
+Usage: python benchmarks/bench_workspace.py [--frames N]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+
+IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'images', 'intensity.png')
+
+
+def run(imgpr, img, frames):
+    imgpr.process_frame(img)  # warm up, fills the workspace
+
+    latencies = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        imgpr.process_frame(img)
+        latencies.append(time.perf_counter() - t0)
+
+    # numpy and OpenCV output arrays are traced, so the peak is the transient per-frame allocation
+    tracemalloc.start()
+    for _ in range(frames):
+        imgpr.process_frame(img)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'peak_kb': peak / 1024,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+
+    img = cv2.imread(IMAGE, cv2.IMREAD_GRAYSCALE)
+    print(f"{'mode':>12} {'peak KB':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, imgpr in (('allocating', Imgpr(use_workspace=False)), ('workspace', Imgpr(use_workspace=True))):
+        r = run(imgpr, img, args.frames)
+        print(f"{name:>12} {r['peak_kb']:>9.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+""" Soak test of the full capture/detection pipeline against the simulated camera.
+
+Usage: python benchmarks/soak_pipeline.py [--fps 60] [--seconds 60] [--source clip.avi]
+
+Runs SimulatedCamera -> AutoRoiCamera -> FramePipeline -> StatefulDetector,
+the same chain app.py builds, without Qt or ids_peak. Prints the pipeline
+stats every few seconds and a summary at the end. With a synthetic source
+the last reported angle is checked against the drawn one.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from impl import Imgpr
+from params import ANGLE_METHODS
+from sim_camera import SimulatedCamera
+from autoroi import AutoRoiCamera
+from pipeline import FramePipeline
+from estimator import StatefulDetector
+from synthetic import angle_error
+
+
+def summary(stats):
+    fps = stats['fps']
+    return (f"capture {fps['capture']:.1f} FPS, process {fps['process']:.1f} FPS, "
+            f"process mean {stats['process']['mean_ms']:.1f} ms max {stats['process']['max_ms']:.1f} ms, "
+            f"queue drops {stats['frame_queue']['dropped']}, camera {stats.get('camera')}, "
+            f"exceptions {stats['exceptions']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--source', default=None, help='image, image directory or video, synthetic disc if omitted')
+    parser.add_argument('--rotation', type=float, default=0.0, help='synthetic disc rotation in degrees per frame')
+    parser.add_argument('--noise', type=float, default=2.0)
+    parser.add_argument('--jitter', type=float, default=0.2)
+    parser.add_argument('--drop-rate', type=float, default=0.01)
+    parser.add_argument('--incomplete-rate', type=float, default=0.01)
+    parser.add_argument('--detect-every', type=int, default=3)
+    parser.add_argument('--angle-method', default='hough', choices=ANGLE_METHODS)
+    parser.add_argument('--no-roi', action='store_true', help='always read the full frame')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    camera = SimulatedCamera(args.source, fps=args.fps, jitter=args.jitter, drop_rate=args.drop_rate,
+                             incomplete_rate=args.incomplete_rate, rotation=args.rotation, noise=args.noise)
+    if not camera.open_camera() or not camera.start_acquisition():
+        sys.exit(f"Failed to open {args.source}")
+
+    source = camera if args.no_roi else AutoRoiCamera(camera)
+    detector = StatefulDetector(Imgpr(track_circle=True, angle_method=args.angle_method), detect_every=args.detect_every)
+    pipeline = FramePipeline(source, detector)
+    pipeline.start()
+
+    t0 = time.perf_counter()
+    try:
+        while time.perf_counter() - t0 < args.seconds:
+            time.sleep(min(args.interval, args.seconds - (time.perf_counter() - t0)))
+            print(f"{time.perf_counter() - t0:6.1f} s  {summary(pipeline.stats())}")
+    finally:
+        pipeline.stop()
+        camera.dispose()
+
+    stats = pipeline.stats()
+    print(json.dumps(stats, indent=2, default=str))
+    result = pipeline.latest_result()
+    if result is not None and camera.truth_angle is not None and result['ink_angle'] is not None:
+        print(f"Last angle {result['ink_angle']:.2f}, drawn {camera.truth_angle:.2f}, "
+              f"error {angle_error(result['ink_angle'], camera.truth_angle):.2f} deg")
+    if source is not camera:
+        print(f"ROI changes: {source.roi_changes}, final ROI {camera.get_roi()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,56 @@
 import sys
 from ids_peak import ids_peak as peak
 from ids_peak import ids_peak_ipl_extension
+from camera_base import Camera
+
+
+def list_serials():
+    """ Serial numbers of the IDS devices that can be opened right now. """
+    peak.Library.Initialize()
+    try:
+        device_manager = peak.DeviceManager.Instance()
+        device_manager.Update()
+        devices = device_manager.Devices()
+        return [devices[i].SerialNumber() for i in range(devices.size()) if devices[i].IsOpenable()]
+    finally:
+        peak.Library.Close()
+
+
+class BorrowedFrame:
+    """ Numpy view over a driver buffer. release() hands the buffer back to the queue. """
+
+    def __init__(self, camera, buffer, array, timestamp_ns):
+        self._camera = camera
+        self._buffer = buffer
+        self.array = array
+        self.timestamp_ns = timestamp_ns
+
+    def release(self):
+        if self._buffer is not None:
+            self._camera.requeue_buffer(self._buffer)
+            self._buffer = None
+            self.array = None
 
+    def __enter__(self):
+        return self
 
-class IDSCamera:
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class IDSCamera(Camera):
     
-    def __init__(self):
+    def __init__(self, num_buffers=None, serial=None):
+        super().__init__()
         peak.Library.Initialize()
+        # Serial number of the device to open, None for the first openable one
+        self.serial = serial
         self.m_device = None
         self.m_dataStream = None
         self.m_node_map_remote_device = None
+        # Size of the buffer ring, None for the driver minimum
+        self.num_buffers = num_buffers
+        self.incomplete_frames = 0
 
     def open_camera(self):
         try:
@@ -23,19 +64,22 @@ class IDSCamera:
             if device_manager.Devices().empty():
                 return False
 
-            # open the first openable device in the device manager's device list
+            # open the first openable device in the device manager's device list, or the one with our serial
             device_count = device_manager.Devices().size()
             for i in range(device_count):
-                if device_manager.Devices()[i].IsOpenable():
-                    self.m_device = device_manager.Devices()[i].OpenDevice(peak.DeviceAccessType_Control)
+                descriptor = device_manager.Devices()[i]
+                if self.serial is not None and descriptor.SerialNumber() != self.serial:
+                    continue
+                if descriptor.IsOpenable():
+                    self.m_device = descriptor.OpenDevice(peak.DeviceAccessType_Control)
+                    self.serial = descriptor.SerialNumber()
         
                     # Get NodeMap of the RemoteDevice for all accesses to the GenICam NodeMap tree
                     self.m_node_map_remote_device = self.m_device.RemoteDevice().NodeMaps()[0]
 
                     return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
     
@@ -47,8 +91,7 @@ class IDSCamera:
             
             return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
 
@@ -65,8 +108,7 @@ class IDSCamera:
 
             return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
 
@@ -103,11 +145,51 @@ class IDSCamera:
 
                 return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
 
+    def get_roi(self):
+        """ Current (x, y, width, height), or None. """
+        try:
+            return (self.m_node_map_remote_device.FindNode("OffsetX").Value(),
+                    self.m_node_map_remote_device.FindNode("OffsetY").Value(),
+                    self.m_node_map_remote_device.FindNode("Width").Value(),
+                    self.m_node_map_remote_device.FindNode("Height").Value())
+        except Exception as e:
+            self.record_error(e)
+        return None
+
+    def get_roi_constraints(self):
+        """ Sensor size, minimum size and alignment steps of the ROI nodes, or None. """
+        try:
+            node_map = self.m_node_map_remote_device
+            return {
+                'sensor_width': node_map.FindNode("WidthMax").Value(),
+                'sensor_height': node_map.FindNode("HeightMax").Value(),
+                'min_width': node_map.FindNode("Width").Minimum(),
+                'min_height': node_map.FindNode("Height").Minimum(),
+                'inc_x': node_map.FindNode("OffsetX").Increment(),
+                'inc_y': node_map.FindNode("OffsetY").Increment(),
+                'inc_width': node_map.FindNode("Width").Increment(),
+                'inc_height': node_map.FindNode("Height").Increment(),
+            }
+        except Exception as e:
+            self.record_error(e)
+        return None
+
+    def change_roi(self, x, y, width, height):
+        """ Stop, set a new ROI, re-allocate buffers for the new payload size and restart. """
+        if not self.stop_acquisition():
+            return False
+        ok = self.set_roi(x, y, width, height)
+        # Restart even if the ROI was rejected so the stream keeps running
+        if not self.alloc_and_announce_buffers():
+            return False
+        if not self.start_acquisition():
+            return False
+        return ok
+
     def config_image(self):
         try:
             # Nodemap for accessing GenICam nodes
@@ -131,8 +213,7 @@ class IDSCamera:
             
             return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
         
         return False
         
@@ -150,22 +231,25 @@ class IDSCamera:
 
                 # Get number of minimum required buffers
                 num_buffers_min_required = self.m_dataStream.NumBuffersAnnouncedMinRequired()
+                num_buffers = max(num_buffers_min_required, self.num_buffers or 0)
 
                 # Alloc buffers
-                for count in range(num_buffers_min_required):
+                for count in range(num_buffers):
                     buffer = self.m_dataStream.AllocAndAnnounceBuffer(payload_size)
                     self.m_dataStream.QueueBuffer(buffer)
 
                 return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
 
 
     def start_acquisition(self):
         try:
+            # Frames arriving later than 1.5 periods after the previous one are counted as late
+            self.frame_period_ns = 1e9 / self.m_node_map_remote_device.FindNode("AcquisitionFrameRate").Value()
+            self.last_timestamp_ns = None
             self.m_dataStream.StartAcquisition(peak.AcquisitionStartMode_Default, peak.DataStream.INFINITE_NUMBER)
             self.m_node_map_remote_device.FindNode("TLParamsLocked").SetValue(1)
             self.m_node_map_remote_device.FindNode("AcquisitionStart").Execute()
@@ -173,8 +257,7 @@ class IDSCamera:
         
             return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
     
@@ -192,8 +275,7 @@ class IDSCamera:
         
             return True
         except Exception as e:
-            # ...
-            str_error = str(e)
+            self.record_error(e)
 
         return False
 
@@ -211,6 +293,7 @@ class IDSCamera:
                 print("ComponentSelector or ComponentEnable node is not available.")
                 return False
         except Exception as e:
+            self.record_error(e)
             print(f"Failed to enable PolarizationAngle: {e}")
         return False
             
@@ -227,19 +310,88 @@ class IDSCamera:
                 print("ComponentSelector or ComponentEnable node is not available.")
                 return False
         except Exception as e:
+            self.record_error(e)
             print(f"Failed to enable Intensity: {e}")
         return False
     
-    def capture_frame(self):
+    def acquire_frame(self, timeout_ms=1000):
+        """ Wait for a frame and lend it out without copying.
+
+        The buffer stays out of the driver queue until the returned
+        BorrowedFrame is released, so keep the ring larger than the
+        number of frames held at once.
+        """
         try:
-            buffer = self.m_dataStream.WaitForFinishedBuffer(1000)
-            frame = ids_peak_ipl_extension.BufferToImage(buffer).get_numpy()
-            self.m_dataStream.QueueBuffer(buffer)
-            return frame
+            buffer = self.m_dataStream.WaitForFinishedBuffer(timeout_ms)
+        except Exception as e:
+            self.record_error(e)
+            print(f"Exception: {e}")
+            return None
+
+        try:
+            if buffer.IsIncomplete():
+                self.incomplete_frames += 1
+                self.requeue_buffer(buffer)
+                return None
+
+            timestamp_ns = buffer.Timestamp_ns()
+            self.count_late_frame(timestamp_ns)
+
+            array = ids_peak_ipl_extension.BufferToImage(buffer).get_numpy()
+            return BorrowedFrame(self, buffer, array, timestamp_ns)
         except Exception as e:
+            self.record_error(e)
             print(f"Exception: {e}")
+            self.requeue_buffer(buffer)
             return None
 
+    def requeue_buffer(self, buffer):
+        try:
+            self.m_dataStream.QueueBuffer(buffer)
+        except Exception as e:
+            self.record_error(e)
+            print(f"Failed to queue buffer: {e}")
+
+    def capture_frame(self):
+        frame = self.acquire_frame()
+        if frame is None:
+            return None
+        # Copy out so the buffer can go straight back to the driver
+        with frame:
+            array = frame.array.copy()
+        self.bytes_copied = array.nbytes
+        return array
+
+    def get_statistics(self):
+        """ Dropped/lost/incomplete counters from the data stream plus local late/incomplete counts. """
+        stats = {'late': self.late_frames, 'incomplete_local': self.incomplete_frames, 'errors': self.error_count}
+        if self.m_dataStream is None:
+            return stats
+
+        nodes = {
+            'delivered': "StreamDeliveredFrameCount",
+            'dropped': "StreamDroppedFrameCount",
+            'lost': "StreamLostFrameCount",
+            'incomplete': "StreamIncompleteFrameCount",
+            'underruns': "StreamBufferUnderrunCount",
+        }
+        try:
+            node_map = self.m_dataStream.NodeMaps()[0]
+        except Exception as e:
+            return stats
+        for key, name in nodes.items():
+            try:
+                stats[key] = node_map.FindNode(name).Value()
+            except Exception as e:
+                # Not every transport layer provides every counter
+                stats[key] = None
+        try:
+            stats['buffers_announced'] = self.m_dataStream.NumBuffersAnnounced()
+            stats['buffers_queued'] = self.m_dataStream.NumBuffersQueued()
+        except Exception as e:
+            pass
+        return stats
+
     def dispose(self):
         peak.Library.Close()
         
\ No newline at end of file
@@ -0,0 +1,81 @@
+from abc import ABC, abstractmethod
+
+# File types read as still images (SimulatedCamera sources, batch.py inputs)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+
+class Camera(ABC):
+    """ Interface the application expects from a camera backend.
+
+    The bring-up methods follow IDSCamera and return True on success. A
+    backend must implement open_camera, start_acquisition and
+    capture_frame; for any other feature it lacks it can keep the default.
+    """
+
+    # Bytes copied out of a driver buffer for the last frame, 0 when frames are not copied
+    bytes_copied = 0
+
+    def __init__(self):
+        # Counters behind the 'late' and 'errors' statistics
+        self.frame_period_ns = None
+        self.last_timestamp_ns = None
+        self.late_frames = 0
+        self.error_count = 0
+        self.last_error = None
+
+    def record_error(self, e):
+        """ Keep the exception for the status panel and metrics instead of dropping it. """
+        self.error_count += 1
+        self.last_error = str(e)
+
+    def count_late_frame(self, timestamp_ns):
+        """ Count a frame more than 1.5 frame periods after the previous one as late, then remember its time. """
+        if self.last_timestamp_ns is not None and self.frame_period_ns:
+            if timestamp_ns - self.last_timestamp_ns > 1.5 * self.frame_period_ns:
+                self.late_frames += 1
+        self.last_timestamp_ns = timestamp_ns
+
+    @abstractmethod
+    def open_camera(self):
+        pass
+
+    def prepare_acquisition(self):
+        return True
+
+    def enable_polarize_angle(self):
+        return True
+
+    def enable_intensity(self):
+        return True
+
+    def config_image(self):
+        return True
+
+    def alloc_and_announce_buffers(self):
+        return True
+
+    @abstractmethod
+    def start_acquisition(self):
+        pass
+
+    def stop_acquisition(self):
+        return True
+
+    @abstractmethod
+    def capture_frame(self):
+        """ Next gray frame as a numpy array the caller owns, or None. """
+
+    def get_statistics(self):
+        return {}
+
+    def get_roi(self):
+        return None
+
+    def get_roi_constraints(self):
+        return None
+
+    def change_roi(self, x, y, width, height):
+        return False
+
+    def dispose(self):
+        pass
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+
+class FrameDisplay():
+    """ Preview path from a full-size gray frame to a QPixmap.
+
+    The frame is resized once, straight into a reused buffer, and the
+    overlays are drawn on that smaller image. Without a detected disc the
+    QImage is built from the gray buffer directly (Format_Grayscale8), so
+    the only full-frame work is the resize itself.
+    """
+
+    def __init__(self, imgpr, scale=0.8):
+        self.imgpr = imgpr
+        self.scale = scale
+        self._gray = None
+        self._bgr = None
+        # Bytes written per frame by the last render, and running totals (the capture copy is Camera.bytes_copied)
+        self.bytes_copied = 0
+        self.total_bytes_copied = 0
+        self.frames = 0
+
+    def _buffers(self, frame):
+        size = (int(frame.shape[1] * self.scale), int(frame.shape[0] * self.scale))
+        if self._gray is None or self._gray.shape != (size[1], size[0]):
+            self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+            self._bgr = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        return size
+
+    def scaled_result(self, result):
+        """ A process_frame result with the circle mapped into preview coordinates. """
+        scaled = dict(result)
+        if result['center'] is not None:
+            # Results are in sensor coordinates, the frame may be an ROI
+            ox, oy = result.get('offset', (0, 0))
+            scaled['center'] = (int(round((result['center'][0] - ox) * self.scale)), int(round((result['center'][1] - oy) * self.scale)))
+            scaled['radius'] = int(round(result['radius'] * self.scale))
+        return scaled
+
+    def render(self, frame, result=None):
+        """ Resize, draw overlays and return a QPixmap of the frame. """
+        size = self._buffers(frame)
+        cv2.resize(frame, size, dst=self._gray, interpolation=cv2.INTER_AREA)
+        copied = self._gray.nbytes
+
+        if result is not None and result['center'] is not None:
+            # Colors are BGR tuples shown through Format_RGB888, as the previous preview did
+            cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR, dst=self._bgr)
+            copied += self._bgr.nbytes
+            self.imgpr.draw_result(self._bgr, self.scaled_result(result))
+            image = self._bgr
+            q_img = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_RGB888)
+        else:
+            image = self._gray
+            q_img = QImage(image.data, image.shape[1], image.shape[0], image.strides[0], QImage.Format_Grayscale8)
+
+        # fromImage copies the pixels, so the buffers can be reused on the next frame
+        pixmap = QPixmap.fromImage(q_img)
+        copied += image.nbytes
+
+        self.bytes_copied = copied
+        self.total_bytes_copied += copied
+        self.frames += 1
+        return pixmap
+
+    def mean_bytes_copied(self):
+        return self.total_bytes_copied / self.frames if self.frames else 0.0
@@ -0,0 +1,86 @@
+import os
+import time
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from impl import Imgpr
+
+# Per-process state of the pool workers
+_worker_shms = None
+_worker_frames = None
+_worker_imgpr = None
+
+
+def _init_worker(shm_names, shape, dtype, angle_method):
+    global _worker_shms, _worker_frames, _worker_imgpr
+    _worker_shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    _worker_frames = [np.ndarray(shape, dtype=dtype, buffer=shm.buf) for shm in _worker_shms]
+    _worker_imgpr = Imgpr(angle_method=angle_method)
+
+
+def _process_slot(slot):
+    t0 = time.perf_counter()
+    result = _worker_imgpr.process_frame(_worker_frames[slot])
+    result['process_ms'] = (time.perf_counter() - t0) * 1000
+    return result
+
+
+class DetectionEngine():
+    """ Run Imgpr.process_frame over a multiprocessing pool.
+
+    Frames are copied into a ring of shared-memory slots so only the slot
+    index and the small result dict cross the process boundary. Results
+    come back in the order the frames were submitted.
+    """
+
+    def __init__(self, frame_shape, dtype=np.uint8, workers=None, slots=None, angle_method='hough'):
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.workers = workers or os.cpu_count() or 1
+        self.slots = slots or 2 * self.workers
+
+        nbytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self._shms = [shared_memory.SharedMemory(create=True, size=nbytes) for _ in range(self.slots)]
+        self._frames = [np.ndarray(self.frame_shape, dtype=self.dtype, buffer=shm.buf) for shm in self._shms]
+        self._pool = mp.Pool(self.workers, initializer=_init_worker,
+                             initargs=([shm.name for shm in self._shms], self.frame_shape, self.dtype.str, angle_method))
+
+    def map(self, frames):
+        """ Yield a process_frame result (plus worker 'process_ms') for each frame, in input order. """
+        pending = deque()
+        free_slots = deque(range(self.slots))
+
+        for frame in frames:
+            if not free_slots:
+                slot, async_result = pending.popleft()
+                free_slots.append(slot)
+                yield async_result.get()
+
+            slot = free_slots.popleft()
+            np.copyto(self._frames[slot], frame)
+            pending.append((slot, self._pool.apply_async(_process_slot, (slot,))))
+
+        while pending:
+            slot, async_result = pending.popleft()
+            yield async_result.get()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        # Drop our views before releasing the segments
+        self._frames = []
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,153 @@
+import math
+
+from params import ANGLE_PARAMS, CIRCLE_PARAMS
+
+# Quality figures of a detection passed on next to raw_ink_angle (see Imgpr.process_frame)
+MEASUREMENT_KEYS = ('ink_angle_std', 'fit_residual', 'confidence')
+
+
+def wrap_angle(angle):
+    """ Map a line-angle difference to [-90, 90) degrees. """
+    return (angle + 90.0) % 180.0 - 90.0
+
+
+class AngleEstimator():
+    """ Scalar Kalman filter for a line angle on the 180 degree circle.
+
+    The model is a constant angle with process noise `q` (deg^2 per frame)
+    and measurement noise `r` (deg^2). Measurements further than `gate`
+    standard deviations from the prediction are rejected as outliers, and
+    `max_outliers` rejections in a row re-initialize the filter on the new
+    value, so a real change of part is followed.
+    """
+
+    def __init__(self, q=0.01, r=0.25, gate=3.0, max_outliers=3):
+        self.q = q
+        self.r = r
+        self.gate = gate
+        self.max_outliers = max_outliers
+        self.reset()
+
+    def reset(self):
+        self.angle = None
+        self.variance = None
+        self.innovation = 0.0
+        self.outliers = 0
+
+    def predict(self):
+        if self.angle is not None:
+            self.variance += self.q
+        return self.angle
+
+    def update(self, measurement):
+        """ Fuse one measured angle. Returns True if it was accepted. """
+        if measurement is None:
+            return False
+        if self.angle is None:
+            self.angle = measurement % 180.0
+            self.variance = self.r
+            self.innovation = 0.0
+            self.outliers = 0
+            return True
+
+        self.innovation = wrap_angle(measurement - self.angle)
+        s = self.variance + self.r
+        if abs(self.innovation) > self.gate * math.sqrt(s):
+            self.outliers += 1
+            if self.outliers >= self.max_outliers:
+                self.reset()
+                return self.update(measurement)
+            return False
+
+        self.outliers = 0
+        k = self.variance / s
+        self.angle = (self.angle + k * self.innovation) % 180.0
+        self.variance = (1 - k) * self.variance
+        return True
+
+    def std(self):
+        return math.sqrt(self.variance) if self.variance is not None else None
+
+
+class StatefulDetector():
+    """ Wraps Imgpr.process_frame with a smoothed, gated angle across frames.
+
+    Full detection runs on every `detect_every`-th frame, and on every
+    frame while the track is not established or the last measurement was
+    rejected. Frames in between reuse the last circle and report the
+    filtered angle, so the display stays at full rate with a stable value.
+    Same process_frame(img) interface, so it plugs into FramePipeline.
+    """
+
+    def __init__(self, imgpr, detect_every=5, circle_alpha=0.3, estimator=None):
+        self.imgpr = imgpr
+        self.detect_every = detect_every
+        self.circle_alpha = circle_alpha
+        self.estimator = estimator or AngleEstimator()
+        self.center = None
+        self.radius = None
+        self._since_detection = 0
+
+    def needs_detection(self):
+        return (self.estimator.angle is None or self.center is None or self.estimator.outliers > 0
+                or self._since_detection + 1 >= self.detect_every)
+
+    def _smooth_circle(self, center, radius):
+        if self.center is None:
+            self.center = (float(center[0]), float(center[1]))
+            self.radius = float(radius)
+            return
+        a = self.circle_alpha
+        self.center = (self.center[0] + a * (center[0] - self.center[0]), self.center[1] + a * (center[1] - self.center[1]))
+        self.radius = self.radius + a * (radius - self.radius)
+
+    def shift_origin(self, dx, dy):
+        """ The frame moved on the sensor (ROI change): keep the circle on the same spot of the part. """
+        if self.center is not None:
+            self.center = (self.center[0] + dx, self.center[1] + dy)
+        if hasattr(self.imgpr, 'shift_origin'):
+            self.imgpr.shift_origin(dx, dy)
+
+    def process_frame(self, img):
+        # New detection parameters: drop state measured with the old ones
+        changed = self.imgpr.sync_params() if hasattr(self.imgpr, 'sync_params') else frozenset()
+        if changed & CIRCLE_PARAMS:
+            self.center = None
+            self.radius = None
+        if changed & (CIRCLE_PARAMS | ANGLE_PARAMS):
+            self.estimator.reset()
+
+        self.estimator.predict()
+
+        raw = {}
+        raw_angle = None
+        accepted = False
+        cached = False
+        detected = self.needs_detection()
+        if detected:
+            self._since_detection = 0
+            raw = self.imgpr.process_frame(img)
+            # SceneCache in front of Imgpr: the scene did not change since the measurement
+            cached = raw.get('cached', False)
+            if raw['center'] is None:
+                # Disc gone: start over on the next frame
+                self.center = None
+                self.radius = None
+                self.estimator.reset()
+            else:
+                self._smooth_circle(raw['center'], raw['radius'])
+                raw_angle = raw['ink_angle']
+                # A reused result is no new measurement; updating on it again would shrink the variance for nothing
+                if not cached:
+                    accepted = self.estimator.update(raw_angle)
+        else:
+            self._since_detection += 1
+
+        result = {'center': None, 'radius': None, 'ink_angle': self.estimator.angle,
+                  'raw_ink_angle': raw_angle, 'detected': detected, 'accepted': accepted, 'cached': cached,
+                  'innovation': self.estimator.innovation, 'angle_std': self.estimator.std()}
+        result.update((key, raw[key]) for key in MEASUREMENT_KEYS if key in raw)
+        if self.center is not None:
+            result['center'] = (int(round(self.center[0])), int(round(self.center[1])))
+            result['radius'] = int(round(self.radius))
+        return result
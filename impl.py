@@ -1,58 +1,436 @@
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
-import math
+
+from params import CIRCLE_PARAMS, DetectionParams
+
+# The 1 degree HoughLines theta grid with its cos/sin. Built in float32 the
+# way HoughLines computes its thetas, so the table values match bit for bit.
+HOUGH_THETA_STEP = np.pi / 180
+HOUGH_THETA = np.arange(180, dtype=np.float32) * np.float32(HOUGH_THETA_STEP)
+HOUGH_COS = np.cos(HOUGH_THETA)
+HOUGH_SIN = np.sin(HOUGH_THETA)
+
+# cos/sin tables per theta step, the same construction as above; others are built on first use
+_HOUGH_TRIG = {HOUGH_THETA_STEP: (HOUGH_COS, HOUGH_SIN)}
+
+
+def _hough_trig(theta_step):
+    tables = _HOUGH_TRIG.get(theta_step)
+    if tables is None:
+        theta = np.arange(int(np.pi / theta_step) + 1, dtype=np.float32) * np.float32(theta_step)
+        tables = _HOUGH_TRIG[theta_step] = (np.cos(theta), np.sin(theta))
+    return tables
 
 
 class Imgpr():
     
-    def __init__(self):
-        pass
+    def __init__(self, track_circle=False, angle_method='hough', use_workspace=True, pyramid_scale=1, params=None):
+        self.circle_tracker = CircleTracker(self) if track_circle else None
+        self.workspace = Workspace() if use_workspace else None
+        # ParameterStore followed frame by frame (see sync_params), or None for fixed defaults
+        self.param_store = params
+        self.params = params.current if params is not None else DetectionParams(angle_method=angle_method)
+        # 'hough': endpoints + group_lines, 'hough_polar': ink_angle_polar,
+        # 'orientation': ink_angle_orientation. Can be switched between frames.
+        self.angle_method = self.params.angle_method
+        # > 1: coarse detection on a 1/pyramid_scale image, refined at full resolution
+        self.pyramid_scale = pyramid_scale
+        # Disc radius range in px of the full-frame HoughCircles search
+        self.radius_range = (300, 450)
     
-    def canny(self, img, th1=0, th2=75):
-        edges = cv2.Canny(img, th1, th2)
+    def canny(self, img, th1=0, th2=75, dst=None):
+        edges = cv2.Canny(img, th1, th2, edges=dst)
         return edges
     
-    def detect_circle(self, img, mis_dist):
-        circles = cv2.HoughCircles(img, cv2.HOUGH_GRADIENT, 1.5, mis_dist, param1 = 75, param2 = 80, minRadius = 300, maxRadius = 450)
+    def detect_circle(self, img, mis_dist, min_radius=300, max_radius=450, param1=75, param2=80):
+        circles = cv2.HoughCircles(img, cv2.HOUGH_GRADIENT, 1.5, mis_dist, param1 = param1, param2 = param2, minRadius = min_radius, maxRadius = max_radius)
         return circles
 
+    def detect_circle_roi(self, img, center, radius, margin=40, radius_tol=20, param1=75, param2=80):
+        """ HoughCircles on a window around a known circle with a narrow radius range. """
+        cx, cy = center
+        half = radius + margin
+        x0 = max(int(cx - half), 0)
+        y0 = max(int(cy - half), 0)
+        x1 = min(int(cx + half), img.shape[1])
+        y1 = min(int(cy + half), img.shape[0])
+        roi = img[y0:y1, x0:x1]
+
+        circles = cv2.HoughCircles(roi, cv2.HOUGH_GRADIENT, 1.5, max(roi.shape), param1 = param1, param2 = param2,
+                                   minRadius = max(int(radius - radius_tol), 1), maxRadius = int(radius + radius_tol))
+        if circles is not None:
+            circles[0, :, 0] += x0
+            circles[0, :, 1] += y0
+        return circles
+
+    def circle_edge_support(self, img, center, radius, samples=90, offset=3, contrast=20):
+        """ Fraction of points on the circle with an intensity step across it (0..1). """
+        theta = np.linspace(0, 2*np.pi, samples, endpoint=False)
+        cos_t = np.cos(theta)
+        sin_t = np.sin(theta)
+        h, w = img.shape[:2]
+        xi = np.clip(np.rint(center[0] + (radius - offset) * cos_t).astype(np.intp), 0, w - 1)
+        yi = np.clip(np.rint(center[1] + (radius - offset) * sin_t).astype(np.intp), 0, h - 1)
+        xo = np.clip(np.rint(center[0] + (radius + offset) * cos_t).astype(np.intp), 0, w - 1)
+        yo = np.clip(np.rint(center[1] + (radius + offset) * sin_t).astype(np.intp), 0, h - 1)
+        step = np.abs(img[yo, xo].astype(np.int16) - img[yi, xi].astype(np.int16))
+        return float(np.count_nonzero(step > contrast)) / samples
+
+    def refine_circle(self, img, center, radius, window=8, rays=180, min_step=10):
+        """ Least-squares circle through the strongest radial edge on each ray near a coarse circle.
+
+        Returns (center, radius) as floats, or the input when too few rays
+        have an edge inside the frame.
+        """
+        h, w = img.shape[:2]
+        theta = np.linspace(0, 2*np.pi, rays, endpoint=False)
+        cos_t = np.cos(theta)[:, None]
+        sin_t = np.sin(theta)[:, None]
+        r = radius + np.arange(-window, window + 1)
+        xs = np.rint(center[0] + cos_t * r).astype(np.intp)
+        ys = np.rint(center[1] + sin_t * r).astype(np.intp)
+        inside = ((xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)).all(axis=1)
+
+        profile = img[np.clip(ys, 0, h - 1), np.clip(xs, 0, w - 1)].astype(np.float32)
+        step = np.abs(np.diff(profile, axis=1))
+        best = step.argmax(axis=1)
+        keep = inside & (step.max(axis=1) > min_step)
+        if np.count_nonzero(keep) < 10:
+            return center, radius
+
+        edge_r = r[best[keep]] + 0.5
+        px = center[0] + cos_t[keep, 0] * edge_r
+        py = center[1] + sin_t[keep, 0] * edge_r
+        # Kasa fit: x^2 + y^2 + D x + E y + F = 0
+        A = np.column_stack((px, py, np.ones_like(px)))
+        (d, e, f), *_ = np.linalg.lstsq(A, -(px**2 + py**2), rcond=None)
+        cx, cy = -d / 2, -e / 2
+        return (cx, cy), float(np.sqrt(max(cx**2 + cy**2 - f, 0.0)))
+
+    def single_circle(self, circles):
+        """ (center, radius) as ints when exactly one circle was found, else None. """
+        if circles is None or len(circles[0]) != 1:
+            return None
+        circles = np.uint16(np.around(circles))
+        return (int(circles[0, 0, 0]), int(circles[0, 0, 1])), int(circles[0, 0, 2])
+
+    def find_circle(self, img):
+        """ Locate the disc, through the circle tracker when tracking is enabled. """
+        if self.circle_tracker is not None:
+            return self.circle_tracker.update(img)
+        p = self.params
+        return self.single_circle(self.detect_circle(img, img.shape[0]/8, *self.radius_range,
+                                                     param1=p.houghcircle_param1, param2=p.houghcircle_param2))
+
+    def sync_params(self):
+        """ Pick up the store's current parameters, once per frame. Returns the names that changed.
+
+        Reading `current` once gives the frame a consistent snapshot. The
+        circle track is the only cache that depends on parameters, and it
+        is dropped only when a circle parameter changed.
+        """
+        if self.param_store is None:
+            return frozenset()
+        params = self.param_store.current
+        if params.version == self.params.version:
+            return frozenset()
+        changed = params.changed(self.params)
+        self.params = params
+        if 'angle_method' in changed:
+            self.angle_method = params.angle_method
+        if changed & CIRCLE_PARAMS and self.circle_tracker is not None:
+            # The tracked circle was accepted under the old thresholds
+            self.circle_tracker.reset()
+        return changed
+
+    def shift_origin(self, dx, dy):
+        """ The frame moved on the sensor (ROI change): move the tracked circle by (dx, dy) pixels. """
+        if self.circle_tracker is not None:
+            self.circle_tracker.shift_origin(dx, dy)
+
     def detect_lines_p(self, edges, th=100, min_l = 30, max_lg = 60):
         lines = cv2.HoughLinesP(edges, rho=1.0, theta=np.pi/180, threshold=th, minLineLength=min_l, maxLineGap=max_lg)
         return lines
 
     def detect_lines(self, edges, th=170):
+        """ HoughLines as (N, 1, 4) endpoints 1000 px either side of the foot point, like HoughLinesP, or None. """
         lines = cv2.HoughLines(edges, rho=1, theta=np.pi/180, threshold=th)
+        if lines is None:
+            return None
+        return self.polar_to_endpoints(lines.reshape(-1, 2), theta_step=np.pi/180).reshape(-1, 1, 4)
 
-        output = list()
-        if lines is not None:
-            for line in lines:
-                rho,theta = line[0]
-                a = np.cos(theta)
-                b = np.sin(theta)
-                x0 = a*rho
-                y0 = b*rho
-                x1 = int(x0 + 1000*(-b))
-                y1 = int(y0 + 1000*(a))
-                x2 = int(x0 - 1000*(-b))
-                y2 = int(y0 - 1000*(a))
-                
-                output.append([(x1, y1, x2, y2)])
-            return output
+    def polar_trig(self, theta, theta_step=None):
+        """ cos and sin of a theta array.
+
+        Pass theta_step only for thetas straight from HoughLines over the
+        full [0, pi) range with that step: they are multiples of the step,
+        so cos/sin come from a table by index without checking the values.
+        """
+        theta = np.asarray(theta)
+        if theta_step is None:
+            return np.cos(theta), np.sin(theta)
+        cos, sin = _hough_trig(theta_step)
+        index = np.rint(theta / theta_step).astype(np.intp)
+        return cos[index], sin[index]
+
+    def polar_to_endpoints(self, lines, length=1000, theta_step=None):
+        """ (N, 2) rho/theta lines to (N, 4) int endpoints `length` px either side of the foot point.
+
+        theta_step is passed on to polar_trig.
+        """
+        lines = np.asarray(lines).reshape(-1, 2)
+        rho = lines[:, 0]
+        a, b = self.polar_trig(lines[:, 1], theta_step)
+        # Foot point in the input precision, offsets in float64, as the per-line scalar code did
+        x0 = (a * rho).astype(np.float64)
+        y0 = (b * rho).astype(np.float64)
+        a = a.astype(np.float64)
+        b = b.astype(np.float64)
+        # astype truncates toward zero like int()
+        return np.column_stack((x0 + length * (-b), y0 + length * a, x0 - length * (-b), y0 - length * a)).astype(np.int32)
+
+
+    def detect_lines_polar(self, edges, th=170, theta_step=np.pi/180, theta_range=None, votes=False):
+        """ HoughLines output as an (N, 2) float array of (rho, theta), or None.
+
+        theta_range=(lo, hi) limits the accumulator to that window (radians,
+        may extend past 0 or pi, it is split at the wrap). votes=True adds
+        the accumulator value as a third column.
+        """
+        if theta_range is None:
+            windows = [(0.0, np.pi)]
         else:
+            lo, hi = theta_range
+            if lo < 0:
+                windows = [(0.0, hi), (np.pi + lo, np.pi)]
+            elif hi > np.pi:
+                windows = [(lo, np.pi), (0.0, hi - np.pi)]
+            else:
+                windows = [(lo, hi)]
+
+        found = []
+        for lo, hi in windows:
+            if votes:
+                lines = cv2.HoughLinesWithAccumulator(edges, rho=1, theta=theta_step, threshold=th, min_theta=lo, max_theta=hi)
+            else:
+                lines = cv2.HoughLines(edges, rho=1, theta=theta_step, threshold=th, min_theta=lo, max_theta=hi)
+            if lines is not None:
+                found.append(lines.reshape(-1, 3 if votes else 2))
+        if not found:
             return None
+        return np.concatenate(found)
 
+    def group_lines_polar(self, lines, angle_threshold=np.pi/36, dist_threshold=100):
+        """ Cluster (rho, theta) lines by sorted angle, then by sorted rho.
 
-    def line_to_params(self, line):
-        """ Convert line endpoints to slope (m) and intercept (c). """
-        x1, y1, x2, y2 = line[0]
-        if x2 - x1 != 0:  # Avoid division by zero
-            m = (y2 - y1) / (x2 - x1)
-            c = y1 - m * x1
+        theta is unwrapped on its pi period (a line at theta is the line at
+        theta - pi with rho negated) so clusters may straddle vertical. A
+        cluster spans at most angle_threshold / dist_threshold from its
+        first member, so dense texture cannot chain everything together.
+        Returns per-line labels and the (K, 2) mean (rho, theta) per cluster.
+        """
+        n = len(lines)
+        order = np.argsort(lines[:, 1], kind='stable')
+        theta = lines[order, 1].astype(np.float64)
+        rho = lines[order, 0].astype(np.float64)
+
+        # Start after the widest angular gap; lines before it wrap to theta + pi
+        gaps = np.diff(np.append(theta, theta[0] + np.pi))
+        start = (int(np.argmax(gaps)) + 1) % n
+        order = np.roll(order, -start)
+        theta = np.roll(theta, -start)
+        rho = np.roll(rho, -start)
+        wrapped = np.arange(n) >= n - start
+        theta[wrapped] += np.pi
+        rho[wrapped] *= -1
+
+        angle_group = self._split_sorted(theta, angle_threshold)
+        idx = np.lexsort((rho, angle_group))
+        rho = rho[idx]
+        theta = theta[idx]
+        sorted_labels = np.empty(n, dtype=np.intp)
+        bounds = np.flatnonzero(np.diff(angle_group[idx])) + 1
+        k = 0
+        for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [n]))):
+            sub = self._split_sorted(rho[lo:hi], dist_threshold)
+            sorted_labels[lo:hi] = sub + k
+            k += sub[-1] + 1
+
+        counts = np.bincount(sorted_labels)
+        mean_rho = np.bincount(sorted_labels, weights=rho) / counts
+        mean_theta = np.bincount(sorted_labels, weights=theta) / counts
+        over = mean_theta >= np.pi
+        mean_theta[over] -= np.pi
+        mean_rho[over] *= -1
+
+        labels = np.empty(n, dtype=np.intp)
+        labels[order[idx]] = sorted_labels
+        return labels, np.column_stack((mean_rho, mean_theta))
+
+    def _split_sorted(self, values, threshold):
+        """ Labels for sorted values, starting a new group past threshold from the group's first value. """
+        labels = np.empty(len(values), dtype=np.intp)
+        start = 0
+        k = 0
+        # One searchsorted per group, not per value
+        while start < len(values):
+            end = int(np.searchsorted(values, values[start] + threshold, side='right'))
+            labels[start:end] = k
+            k += 1
+            start = end
+        return labels
+
+    def ink_angle_polar(self, edges, center, th=90, angle_threshold=np.pi/36, dist_threshold=100,
+                        theta_step=np.pi/180, theta_range=None):
+        """ Ink angle in degrees [0, 180) straight from the edge map, or None.
+
+        Same steps as the endpoint path (group, average, closest to center,
+        angle) but on the HoughLines (rho, theta) array without rounding to
+        integer endpoints. Closeness is the perpendicular distance from the
+        center to each averaged line.
+        """
+        line = self.ink_line_polar(edges, center, th, angle_threshold, dist_threshold, theta_step, theta_range)
+        if line is None:
+            return None
+        return float(self.polar_angles(line)[0])
+
+    def ink_line_polar(self, edges, center, th=90, angle_threshold=np.pi/36, dist_threshold=100,
+                       theta_step=np.pi/180, theta_range=None):
+        """ The averaged (rho, theta) cluster ink_angle_polar takes its angle from, or None. """
+        lines = self.detect_lines_polar(edges, th, theta_step, theta_range)
+        if lines is None:
+            return None
+
+        _, clusters = self.group_lines_polar(lines, angle_threshold, dist_threshold)
+        closest = int(np.argmin(self.polar_distances_from_center(clusters, center)))
+        return clusters[closest]
+
+    def refine_ink_angle(self, edges, center, radius, point, angle, band=12, iterations=3, min_points=30, max_turn=1.0):
+        """ Sub-degree ink angle from a line fitted to the edge pixels along a coarse Hough line.
+
+        Edge pixels within 2 * band px of the line through `point` at `angle`
+        degrees are fitted by weighted total least squares (the principal
+        axis of their scatter). The fit is re-centred and re-weighted with
+        Tukey's biweight over `band` px `iterations` times, so stray edges
+        barely pull; the rim is left out. Both sides of the ink dashes are
+        fitted together, which gives the dash centre line, so `band` must
+        exceed the ink width plus the coarse line's offset; a narrower band
+        catches one side only and tilts with it.
+
+        Returns (angle in degrees [0, 180), its standard error in degrees,
+        RMS residual in px). The coarse angle comes back with None, None
+        when fewer than `min_points` pixels support the line, or when the
+        fit turns it by more than `max_turn` degrees (the Hough step): the
+        fit then followed other edges, not the ink.
+        """
+        # Only scan the box around the line's chord of the disc
+        phi = np.radians(angle)
+        d = np.array([np.cos(phi), np.sin(phi)])
+        foot = np.asarray(point, dtype=np.float64)
+        foot = foot + d * np.dot(np.asarray(center, dtype=np.float64) - foot, d)
+        ends = np.array([foot - d * radius, foot + d * radius])
+        x0, y0 = np.maximum(np.floor(ends.min(axis=0)).astype(int) - 2 * band, 0)
+        x1, y1 = np.ceil(ends.max(axis=0)).astype(int) + 2 * band + 1
+        points = cv2.findNonZero(edges[y0:y1, x0:x1])
+        if points is None:
+            return angle, None, None
+        points = points.reshape(-1, 2).astype(np.float64) + (x0, y0)
+        # The rim and the mask border cross the line there
+        inside = np.hypot(points[:, 0] - center[0], points[:, 1] - center[1]) < radius - 2 * band
+        x = points[inside, 0]
+        y = points[inside, 1]
+
+        mx, my = point
+        width = 2 * band
+        for _ in range(iterations):
+            r = (x - mx) * -np.sin(phi) + (y - my) * np.cos(phi)
+            near = np.abs(r) < width
+            if np.count_nonzero(near) < min_points:
+                return angle, None, None
+            w = (1 - (r[near] / width) ** 2) ** 2
+            sw = w.sum()
+            mx = (w * x[near]).sum() / sw
+            my = (w * y[near]).sum() / sw
+            dx = x[near] - mx
+            dy = y[near] - my
+            phi = 0.5 * np.arctan2(2 * (w * dx * dy).sum(), (w * dx * dx).sum() - (w * dy * dy).sum())
+            width = band
+
+        r = dx * -np.sin(phi) + dy * np.cos(phi)
+        t = dx * np.cos(phi) + dy * np.sin(phi)
+        rms = np.sqrt((w * r * r).sum() / sw)
+        std = np.degrees(rms / np.sqrt((w * t * t).sum()))
+        refined = float(np.degrees(phi) % 180.0)
+        if abs((refined - angle + 90.0) % 180.0 - 90.0) > max_turn:
+            return angle, None, None
+        return refined, float(std), float(rms)
+
+    def refine_line(self, edges, center, radius, line, polar=False, band=12):
+        """ refine_ink_angle started from a coarse Hough line, returning the same triple.
+
+        `line` is an ink_line (1, 4) endpoint line, or with polar=True an
+        ink_line_polar (rho, theta) line; the coarse angle and the point the
+        fit starts from are taken from it. band=0 skips the fit and returns
+        (coarse angle, None, None).
+        """
+        if polar:
+            angle = float(self.polar_angles(line)[0])
+            point = (line[0] * np.cos(line[1]), line[0] * np.sin(line[1]))
         else:
-            m = np.inf
-            c = x1  # Vertical line case
-        return m, c
+            angle = float(self.angles_from_axis2(line)[0])
+            x1, y1, x2, y2 = line[0]
+            point = ((x1 + x2) / 2, (y1 + y2) / 2)
+        if band <= 0:
+            return angle, None, None
+        return self.refine_ink_angle(edges, center, radius, point, angle, band=band)
+
+    def ink_angle_orientation(self, img, center, radius, inner=0.9, keep=0.02, bins=180):
+        """ Dominant edge orientation inside the disc as (ink angle in degrees, confidence).
+
+        Scharr gradients on the disc's bounding box (rim excluded by
+        `inner`), keeping the strongest `keep` fraction of pixels. The peak
+        of their squared-magnitude weighted orientation histogram is refined
+        with a circular mean over +-2 bins, which gives sub-degree output.
+        The ink line runs perpendicular to that gradient. Confidence is the
+        share of the kept gradient energy that agrees with the peak (0..1).
+        """
+        cx, cy = center
+        r = int(radius * inner)
+        x0 = max(cx - r, 0)
+        y0 = max(cy - r, 0)
+        x1 = min(cx + r + 1, img.shape[1])
+        y1 = min(cy + r + 1, img.shape[0])
+        crop = cv2.GaussianBlur(img[y0:y1, x0:x1], (5, 5), 1.0)
+        gx = cv2.Scharr(crop, cv2.CV_32F, 1, 0)
+        gy = cv2.Scharr(crop, cv2.CV_32F, 0, 1)
+
+        mask = np.zeros(crop.shape, dtype=np.uint8)
+        cv2.circle(mask, (cx - x0, cy - y0), r, 255, -1)
+        energy = cv2.add(cv2.multiply(gx, gx), cv2.multiply(gy, gy))
+        energy[mask == 0] = 0
+
+        flat = energy.ravel()
+        k = min(max(int(flat.size * keep), 10), flat.size)
+        idx = np.argpartition(flat, -k)[-k:]
+        weights = flat[idx]
+        if weights.sum() <= 0:
+            return None, 0.0
+        orientation = np.degrees(np.arctan2(gy.ravel()[idx], gx.ravel()[idx])) % 180.0
+
+        bin_width = 180.0 / bins
+        hist, _ = np.histogram(orientation, bins=bins, range=(0.0, 180.0), weights=weights)
+        peak = (int(np.argmax(hist)) + 0.5) * bin_width
+        near = np.abs((orientation - peak + 90.0) % 180.0 - 90.0) <= 2 * bin_width
+        doubled = np.radians(2 * orientation[near])
+        gradient_angle = np.degrees(0.5 * np.arctan2((weights[near] * np.sin(doubled)).sum(),
+                                                      (weights[near] * np.cos(doubled)).sum()))
+        confidence = float(weights[near].sum() / weights.sum())
+        return float((gradient_angle + 90.0) % 180.0), confidence
+
+    def line_to_params(self, line):
+        """ Convert line endpoints to slope (m) and intercept (c). Single-line lines_to_params. """
+        m, c = self.lines_to_params(line)
+        return float(m[0]), float(c[0])
 
     def group_lines(self, lines, angle_threshold=np.pi/18, dist_threshold=10):
         """ Group lines based on angle and distance similarity. """
@@ -76,6 +454,87 @@ class Imgpr():
         
         return clusters
 
+    def lines_to_params(self, lines):
+        """ Vectorized line_to_params: slope and intercept arrays for a list of lines.
+
+        Vertical lines get m = inf and c = x.
+        """
+        x1, y1, x2, y2 = np.asarray(lines, dtype=np.float64).reshape(-1, 4).T
+        dx = x2 - x1
+        vertical = dx == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m = np.where(vertical, np.inf, (y2 - y1) / dx)
+            c = np.where(vertical, x1, y1 - m * x1)
+        return m, c
+
+    def polar_to_params(self, lines):
+        """ lines_to_params for (N, 2) rho/theta lines, without going through endpoints. """
+        lines = np.asarray(lines).reshape(-1, 2)
+        rho = lines[:, 0].astype(np.float64)
+        a, b = self.polar_trig(lines[:, 1])
+        a = a.astype(np.float64)
+        b = b.astype(np.float64)
+        vertical = b == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            m = np.where(vertical, np.inf, -a / b)
+            c = np.where(vertical, rho / a, rho / b)
+        return m, c
+
+    def group_lines_fast(self, lines, angle_threshold=np.pi/18, dist_threshold=10):
+        """ Same clusters as group_lines, with running means and array comparisons.
+
+        Lines still join the first matching cluster in input order, so the
+        result is identical to group_lines, but each line is compared with
+        all clusters in one NumPy expression and cluster means are updated
+        in O(1) instead of being recomputed from every member.
+        """
+        m, c = self.lines_to_params(lines)
+        n = len(m)
+        # Scalar scan while there are few clusters, array compare once it pays off
+        scan_limit = 16
+        avg_m = []
+        avg_c = []
+        avg_m_arr = np.empty(n)
+        avg_c_arr = np.empty(n)
+        sum_m = []
+        sum_c = []
+        count = []
+        labels = []
+        k = 0
+
+        with np.errstate(invalid='ignore'):
+            for mi, ci in zip(m.tolist(), c.tolist()):
+                j = k
+                if k <= scan_limit:
+                    for idx in range(k):
+                        if abs(mi - avg_m[idx]) < angle_threshold and abs(ci - avg_c[idx]) < dist_threshold:
+                            j = idx
+                            break
+                else:
+                    match = (np.abs(avg_m_arr[:k] - mi) < angle_threshold) & (np.abs(avg_c_arr[:k] - ci) < dist_threshold)
+                    first = match.argmax()
+                    if match[first]:
+                        j = int(first)
+
+                if j == k:
+                    sum_m.append(0.0)
+                    sum_c.append(0.0)
+                    count.append(0)
+                    avg_m.append(0.0)
+                    avg_c.append(0.0)
+                    k += 1
+                sum_m[j] += mi
+                sum_c[j] += ci
+                count[j] += 1
+                avg_m[j] = avg_m_arr[j] = sum_m[j] / count[j]
+                avg_c[j] = avg_c_arr[j] = sum_c[j] / count[j]
+                labels.append(j)
+
+        clusters = [{'lines': [], 'avg_m': avg_m[j], 'avg_c': avg_c[j]} for j in range(k)]
+        for line, j in zip(lines, labels):
+            clusters[j]['lines'].append(line)
+        return clusters
+
     def average_line(self, cluster):
         """ Calculate the average line from a cluster of lines. """
         x1_avg = np.mean([line[0][0] for line in cluster['lines']])
@@ -87,64 +546,281 @@ class Imgpr():
 
     def distance_from_center(self, line, center):
         """ Calculate the distance of the line's midpoint from the center. """
-        x1, y1, x2, y2 = line[0]
-        midpoint = ((x1 + x2) / 2, (y1 + y2) / 2)
-        return np.sqrt((midpoint[0] - center[0]) ** 2 + (midpoint[1] - center[1]) ** 2)
+        return self.distances_from_center(line, center)[0]
+
+    def distances_from_center(self, lines, center):
+        """ Midpoint distance from the center for each (N, 4) endpoint line. """
+        x1, y1, x2, y2 = np.asarray(lines, dtype=np.float64).reshape(-1, 4).T
+        return np.hypot((x1 + x2) / 2 - center[0], (y1 + y2) / 2 - center[1])
+
+    def polar_distances_from_center(self, lines, center):
+        """ Perpendicular distance from the center for each (N, 2) rho/theta line. """
+        lines = np.asarray(lines).reshape(-1, 2)
+        a, b = self.polar_trig(lines[:, 1])
+        return np.abs(center[0] * a.astype(np.float64) + center[1] * b.astype(np.float64) - lines[:, 0])
 
     def calculate_angle_from_axis(self, line):
-        x1, y1, x2, y2 = line[0]
-        
-        # Calculate the slope (m)
-        if x2 - x1 != 0:
-            slope = (y2 - y1) / (x2 - x1)
-            angle_radians = math.atan(slope)
-        else:
-            # The line is vertical
-            angle_radians = np.pi / 2  # 90 degrees
-        
-        # Convert angle to degrees
-        angle_degrees = math.degrees(angle_radians)
-        
-        # Ensure the angle is positive
-        if angle_degrees < 0:
-            angle_degrees += 180
-        
-        return angle_degrees
+        return float(self.angles_from_axis(line)[0])
+
+    def angles_from_axis(self, lines):
+        """ Slope angle in degrees [0, 180) for each (N, 4) endpoint line, vertical is 90. """
+        x1, y1, x2, y2 = np.asarray(lines, dtype=np.float64).reshape(-1, 4).T
+        dx = x2 - x1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            angles = np.where(dx != 0, np.degrees(np.arctan((y2 - y1) / dx)), 90.0)
+        return np.where(angles < 0, angles + 180, angles)
 
     def calculate_angle_from_axis2(self, line):
-        x1, y1, x2, y2 = line[0]
-        
-        # Calculate the angle using atan2
-        angle_radians = math.atan2(y2 - y1, x2 - x1)
-        
-        # Convert angle to degrees
-        angle_degrees = math.degrees(angle_radians)
-        
-        # Ensure the angle is within the range [0, 180)
-        if angle_degrees < 0:
-            angle_degrees += 180
-        
-        return angle_degrees
+        return float(self.angles_from_axis2(line)[0])
+
+    def angles_from_axis2(self, lines):
+        """ atan2 direction in degrees for each (N, 4) endpoint line, negative directions turned by 180. """
+        x1, y1, x2, y2 = np.asarray(lines, dtype=np.float64).reshape(-1, 4).T
+        angles = np.degrees(np.arctan2(y2 - y1, x2 - x1))
+        return np.where(angles < 0, angles + 180, angles)
+
+    def polar_angles(self, lines):
+        """ Line direction in degrees [0, 180) for each (N, 2) rho/theta line (theta + 90). """
+        return (np.degrees(np.asarray(lines).reshape(-1, 2)[:, 1].astype(np.float64)) + 90) % 180
 
     def draw_line_through_circle(self, image, center, radius, angle_degrees, bgr_color=(255, 0, 0)):
+        return self.draw_lines_through_circle(image, center, radius, [angle_degrees], bgr_color)
+
+    def lines_through_circle(self, center, radius, angles_degrees):
+        """ (N, 4) int endpoints of diameters at the given angles, `radius` from the center each way. """
+        angles = np.radians(np.asarray(angles_degrees, dtype=np.float64))
+        dx = radius * np.cos(angles)
+        dy = radius * np.sin(angles)
         cx, cy = center
-        
-        # Convert the angle from degrees to radians
-        angle_radians = math.radians(angle_degrees)
-        
-        # Calculate the endpoints of the line
-        x1 = int(cx + radius * math.cos(angle_radians))
-        y1 = int(cy + radius * math.sin(angle_radians))
-        x2 = int(cx - radius * math.cos(angle_radians))
-        y2 = int(cy - radius * math.sin(angle_radians))
-        
-        # Draw the line on the image
-        cv2.line(image, (x1, y1), (x2, y2), bgr_color, 2)
-        
+        # astype truncates toward zero like int()
+        return np.column_stack((cx + dx, cy + dy, cx - dx, cy - dy)).astype(np.intp)
+
+    def draw_lines_through_circle(self, image, center, radius, angles_degrees, bgr_color=(255, 0, 0)):
+        for x1, y1, x2, y2 in self.lines_through_circle(center, radius, angles_degrees).tolist():
+            cv2.line(image, (x1, y1), (x2, y2), bgr_color, 2)
         return image
     
+    def process_frame(self, img):
+        """ Detect the disc and the ink angle on a gray frame. """
+        self.sync_params()
+        p = self.params
+        if self.pyramid_scale > 1:
+            return self.process_frame_pyramid(img)
+
+        result = {'center': None, 'radius': None, 'ink_angle': None}
+
+        circle = self.find_circle(img)
+        if circle is None:
+            return result
+
+        _center, _radius = circle
+        result['center'] = _center
+        result['radius'] = _radius
+
+        if self.angle_method == 'orientation':
+            result['ink_angle'], result['confidence'] = self.ink_angle_orientation(img, _center, _radius)
+            return result
+
+        if self.workspace is not None:
+            mask = self.workspace.disc_mask(img.shape, _center, _radius)
+            masked_image = cv2.bitwise_and(img, mask, dst=self.workspace.buffer('masked', img.shape))
+            edges = self.canny(masked_image, th2=p.canny_threshold, dst=self.workspace.buffer('edges', img.shape))
+        else:
+            mask = np.zeros_like(img)
+            cv2.circle(mask, _center, _radius, 255, -1)
+            masked_image = cv2.bitwise_and(img, mask)
+            edges = self.canny(masked_image, th2=p.canny_threshold)
+        polar = self.angle_method == 'hough_polar'
+        if polar:
+            line = self.ink_line_polar(edges, _center, th=p.threshold)
+        else:
+            line = self.ink_line(edges, _center, th=p.threshold, angle_threshold=p.group_angle_threshold,
+                                 dist_threshold=p.group_dist_threshold)
+        if line is None:
+            return result
+
+        # The Hough angle is on a 1 degree grid (and the endpoint path rounds to whole pixels), fit the edges for the rest
+        angle, std, rms = self.refine_line(edges, _center, _radius, line, polar=polar, band=p.refine_band)
+        result['ink_angle'] = angle
+        if p.refine_band > 0:
+            result['ink_angle_std'], result['fit_residual'] = std, rms
+        return result
+
+    def ink_angle_lines(self, edges, center, th=90, angle_threshold=5, dist_threshold=100):
+        """ Ink angle in degrees from the endpoint path (HoughLines, group, average, closest to center), or None. """
+        line = self.ink_line(edges, center, th, angle_threshold, dist_threshold)
+        if line is None:
+            return None
+        return float(self.angles_from_axis2(line)[0])
+
+    def ink_line(self, edges, center, th=90, angle_threshold=5, dist_threshold=100):
+        """ The averaged (1, 4) endpoint line ink_angle_lines takes its angle from, or None. """
+        lines = self.detect_lines(edges, th=th)
+        if lines is None:
+            return None
+        clusters = self.group_lines_fast(lines, angle_threshold=angle_threshold, dist_threshold=dist_threshold)
+        averaged_lines = np.concatenate([self.average_line(cluster) for cluster in clusters])
+        closest = int(np.argmin(self.distances_from_center(averaged_lines, center)))
+        return averaged_lines[closest:closest + 1]
+
+    def process_frame_pyramid(self, img, theta_window=np.radians(5), theta_step=np.pi/1800):
+        """ process_frame done coarse-to-fine.
+
+        The circle and a rough ink angle are found on an image downscaled by
+        pyramid_scale, with radii and vote thresholds scaled to match. The
+        circle is then refined on the full-resolution rim, and the angle by
+        a HoughLines restricted to +-theta_window around the coarse answer
+        on the disc's bounding box only.
+        """
+        f = self.pyramid_scale
+        result = {'center': None, 'radius': None, 'ink_angle': None}
+
+        small = cv2.resize(img, (img.shape[1] // f, img.shape[0] // f), interpolation=cv2.INTER_AREA)
+        circle = self.single_circle(self.detect_circle(small, small.shape[0]/8, min_radius=self.radius_range[0] // f,
+                                                       max_radius=self.radius_range[1] // f, param2=80 / np.sqrt(f)))
+        if circle is None:
+            return result
+
+        (cx, cy), r = circle
+        (fx, fy), fr = self.refine_circle(img, (cx * f, cy * f), r * f, window=2 * f)
+        _center = (int(round(fx)), int(round(fy)))
+        _radius = int(round(fr))
+        result['center'] = _center
+        result['radius'] = _radius
+
+        small_mask = np.zeros_like(small)
+        cv2.circle(small_mask, (cx, cy), r, 255, -1)
+        small_edges = self.canny(cv2.bitwise_and(small, small_mask))
+        coarse = self.ink_angle_polar(small_edges, (cx, cy), th=max(90 // f, 10), dist_threshold=100 / f)
+        if coarse is None:
+            return result
+
+        x0 = max(_center[0] - _radius, 0)
+        y0 = max(_center[1] - _radius, 0)
+        x1 = min(_center[0] + _radius + 1, img.shape[1])
+        y1 = min(_center[1] + _radius + 1, img.shape[0])
+        crop = img[y0:y1, x0:x1]
+        mask = np.zeros_like(crop)
+        cv2.circle(mask, (_center[0] - x0, _center[1] - y0), _radius, 255, -1)
+        edges = self.canny(cv2.bitwise_and(crop, mask))
+
+        # Averaging a fine-grid cluster would pull the answer back to the coarse
+        # window's middle, so take the strongest line passing near the center
+        theta = np.radians(coarse - 90) % np.pi
+        lines = self.detect_lines_polar(edges, th=90, theta_step=theta_step, votes=True,
+                                        theta_range=(theta - theta_window, theta + theta_window))
+        result['ink_angle'] = coarse
+        if lines is not None:
+            dist = np.abs((_center[0] - x0) * np.cos(lines[:, 1]) + (_center[1] - y0) * np.sin(lines[:, 1]) - lines[:, 0])
+            near = dist < 100
+            if near.any():
+                best = np.flatnonzero(near)[np.argmax(lines[near, 2])]
+                result['ink_angle'] = float((np.degrees(lines[best, 1]) + 90) % 180)
+        return result
+
+    def draw_result(self, image, result):
+        """ Draw the detected disc and ink line of a process_frame result. """
+        if result['center'] is None:
+            return image
+
+        cv2.circle(image, result['center'], 1, (0, 100, 100), 3)
+        cv2.circle(image, result['center'], result['radius'], (255, 0, 255), 3)
+        if result['ink_angle'] is not None:
+            image = self.draw_line_through_circle(image, center=result['center'], radius=result['radius']+30, angle_degrees=result['ink_angle'])
+
+        return image
+
     def resize(self, img, w=None, h=None, percent = 0.8):
         if(w ==None and h==None):
             return cv2.resize(img, (int(img.shape[1] * 0.8), int(img.shape[0] * 0.8)))
         else:
-            return cv2.resize(img, (int(w), int(h)))
\ No newline at end of file
+            return cv2.resize(img, (int(w), int(h)))
+
+
+class Workspace():
+    """ Per-resolution uint8 buffers reused as dst= arguments across frames. """
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0
+        self._mask_key = None
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+            self.allocations += 1
+            if name == 'mask':
+                self._mask_key = None
+        return buf
+
+    def disc_mask(self, shape, center, radius):
+        """ Filled disc mask, redrawn only when the circle changes. """
+        mask = self.buffer('mask', shape)
+        key = (center, radius)
+        if key != self._mask_key:
+            mask.fill(0)
+            cv2.circle(mask, center, radius, 255, -1)
+            self._mask_key = key
+        return mask
+
+
+class CircleTracker():
+    """ Follow the disc between frames with a cropped, narrow-radius search.
+
+    A full-frame HoughCircles is only run when there is no track yet, the
+    windowed search loses the circle, the circle jumps further than
+    `margin`, or its edge support drops below `min_confidence`.
+    """
+
+    def __init__(self, imgpr, margin=40, radius_tol=20, min_confidence=0.5):
+        self.imgpr = imgpr
+        self.margin = margin
+        self.radius_tol = radius_tol
+        self.min_confidence = min_confidence
+        self.center = None
+        self.radius = None
+        self.confidence = 0.0
+        self.full_searches = 0
+        self.tracked_searches = 0
+
+    def reset(self):
+        self.center = None
+        self.radius = None
+        self.confidence = 0.0
+
+    def shift_origin(self, dx, dy):
+        if self.center is not None:
+            self.center = (self.center[0] + dx, self.center[1] + dy)
+
+    def update(self, img):
+        """ Return (center, radius) for this frame, or None if the disc is not found. """
+        p = self.imgpr.params
+        circle = None
+        if self.center is not None:
+            self.tracked_searches += 1
+            circle = self.imgpr.single_circle(
+                self.imgpr.detect_circle_roi(img, self.center, self.radius, self.margin, self.radius_tol,
+                                             p.houghcircle_param1, p.houghcircle_param2))
+            if circle is not None and not self._accept(img, circle):
+                circle = None
+
+        if circle is None:
+            self.full_searches += 1
+            circle = self.imgpr.single_circle(self.imgpr.detect_circle(img, img.shape[0]/8, *self.imgpr.radius_range,
+                                                                       param1=p.houghcircle_param1, param2=p.houghcircle_param2))
+            if circle is None:
+                self.reset()
+                return None
+            self.confidence = self.imgpr.circle_edge_support(img, circle[0], circle[1])
+
+        self.center, self.radius = circle
+        return circle
+
+    def _accept(self, img, circle):
+        (cx, cy), radius = circle
+        if abs(cx - self.center[0]) > self.margin or abs(cy - self.center[1]) > self.margin:
+            return False
+        self.confidence = self.imgpr.circle_edge_support(img, (cx, cy), radius)
+        return self.confidence >= self.min_confidence
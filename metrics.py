@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+PREFIX = 'paf'
+
+# Camera statistics that are current levels rather than running counts, exported under their state label
+CAMERA_GAUGES = {'buffers_announced': 'announced', 'buffers_queued': 'queued'}
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def format_prometheus(stats):
+    """ Render FramePipeline.stats() in the Prometheus text exposition format. """
+    lines = [f'# TYPE {PREFIX}_stage_latency_seconds histogram']
+    for stage in ('capture', 'process', 'display'):
+        timer = stats[stage]
+        cumulative = 0
+        for bound, count in zip(timer['buckets'], timer['bucket_counts']):
+            cumulative += count
+            lines.append(f'{PREFIX}_stage_latency_seconds_bucket{_labels(stage=stage, le=bound)} {cumulative}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_bucket{_labels(stage=stage, le="+Inf")} {timer["count"]}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_sum{_labels(stage=stage)} {timer["total_s"]}')
+        lines.append(f'{PREFIX}_stage_latency_seconds_count{_labels(stage=stage)} {timer["count"]}')
+
+    lines.append(f'# TYPE {PREFIX}_fps gauge')
+    for stage, fps in stats['fps'].items():
+        lines.append(f'{PREFIX}_fps{_labels(stage=stage)} {fps}')
+
+    lines.append(f'# TYPE {PREFIX}_queue_depth gauge')
+    lines.append(f'# TYPE {PREFIX}_queue_dropped_total counter')
+    for queue in ('frame_queue', 'result_queue'):
+        lines.append(f'{PREFIX}_queue_depth{_labels(queue=queue)} {stats[queue]["depth"]}')
+        lines.append(f'{PREFIX}_queue_dropped_total{_labels(queue=queue)} {stats[queue]["dropped"]}')
+
+    lines.append(f'# TYPE {PREFIX}_exceptions_total counter')
+    for stage, count in stats['exceptions'].items():
+        lines.append(f'{PREFIX}_exceptions_total{_labels(stage=stage)} {count}')
+
+    camera = {key: value for key, value in stats.get('camera', {}).items() if value is not None}
+    frames = {key: value for key, value in camera.items() if key not in CAMERA_GAUGES and key != 'errors'}
+    if frames:
+        lines.append(f'# TYPE {PREFIX}_camera_frames_total counter')
+        for key, value in frames.items():
+            lines.append(f'{PREFIX}_camera_frames_total{_labels(kind=key)} {value}')
+    if 'errors' in camera:
+        lines.append(f'# TYPE {PREFIX}_camera_errors_total counter')
+        lines.append(f'{PREFIX}_camera_errors_total {camera["errors"]}')
+    buffers = {state: camera[key] for key, state in CAMERA_GAUGES.items() if key in camera}
+    if buffers:
+        lines.append(f'# TYPE {PREFIX}_camera_buffers gauge')
+        for state, value in buffers.items():
+            lines.append(f'{PREFIX}_camera_buffers{_labels(state=state)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer():
+    """ Serve the pipeline stats as Prometheus text on http://host:port/metrics. """
+
+    def __init__(self, pipeline, port=9108, host='127.0.0.1'):
+        self.pipeline = pipeline
+
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = format_prometheus(outer.pipeline.stats()).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class JsonMetricsLog():
+    """ Append one JSON line of pipeline stats every `interval` seconds to a rotating file. """
+
+    def __init__(self, pipeline, path='metrics.jsonl', interval=10.0, max_bytes=5_000_000, backup_count=3):
+        self.pipeline = pipeline
+        self.interval = interval
+        self._logger = logging.getLogger(f'{PREFIX}.metrics.{id(self)}')
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        self._logger.addHandler(self._handler)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-log', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        self._logger.info(json.dumps({'time': time.time(), 'stats': self.pipeline.stats()}))
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
@@ -0,0 +1,113 @@
+import os
+import threading
+
+from pipeline import FramePipeline, RateMeter, DROP_OLDEST
+
+
+class CameraManager():
+    """ Several cameras in one process: a capture thread per camera, shared detection threads.
+
+    Each camera gets its own FramePipeline, started without its process
+    thread, and its own processor, since the detectors keep per-camera
+    state. A fixed pool of `workers` threads serves all cameras round-robin.
+    A camera is handled by one worker at a time, so its frames stay in
+    order and its processor is never entered twice at once. OpenCV
+    releases the GIL, so the workers run in parallel.
+    """
+
+    def __init__(self, workers=None, queue_size=2, policy=DROP_OLDEST):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.policy = policy
+        self.pipelines = {}
+        self.worker_rate = RateMeter()
+        self._order = []
+        self._busy = set()
+        self._next = 0
+        self._cond = threading.Condition()
+        self._running = threading.Event()
+        self._threads = []
+
+    def add(self, name, camera, processor):
+        """ Register a started camera under `name` (e.g. its serial number). Returns its pipeline. """
+        pipeline = FramePipeline(camera, processor, self.queue_size, self.policy)
+        pipeline.on_frame = self._frame_ready
+        with self._cond:
+            if name in self.pipelines:
+                raise ValueError(f"Camera {name} is already managed")
+            self.pipelines[name] = pipeline
+            self._order.append(name)
+        if self._running.is_set():
+            pipeline.start(process=False)
+        return pipeline
+
+    def remove(self, name):
+        with self._cond:
+            pipeline = self.pipelines.pop(name, None)
+            if name in self._order:
+                self._order.remove(name)
+        if pipeline is not None:
+            pipeline.stop()
+        return pipeline
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._running.set()
+        for pipeline in list(self.pipelines.values()):
+            pipeline.start(process=False)
+        self._threads = [threading.Thread(target=self._worker_loop, name=f'detect-{i}', daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running.clear()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        for pipeline in list(self.pipelines.values()):
+            pipeline.stop(timeout)
+
+    def _frame_ready(self, pipeline):
+        with self._cond:
+            self._cond.notify()
+
+    def _claim(self):
+        """ Next camera with a queued frame that no other worker holds, round-robin. Call with _cond held. """
+        count = len(self._order)
+        for i in range(count):
+            name = self._order[(self._next + i) % count]
+            if name not in self._busy and self.pipelines[name].frame_queue.qsize() > 0:
+                self._next = (self._next + i + 1) % count
+                self._busy.add(name)
+                return name
+        return None
+
+    def _worker_loop(self):
+        while self._running.is_set():
+            with self._cond:
+                name = self._claim()
+                if name is None:
+                    # Woken by a new frame or a worker finishing, the timeout covers a stop
+                    self._cond.wait(0.1)
+                    continue
+                pipeline = self.pipelines[name]
+            try:
+                if pipeline.process_next(timeout=0):
+                    self.worker_rate.tick()
+            finally:
+                with self._cond:
+                    self._busy.discard(name)
+                    self._cond.notify()
+
+    def latest_results(self):
+        """ {name: newest result or None} for the display. """
+        return {name: pipeline.latest_result() for name, pipeline in list(self.pipelines.items())}
+
+    def stats(self):
+        """ Per-camera FramePipeline.stats() plus the shared pool's throughput. """
+        cameras = {name: pipeline.stats() for name, pipeline in list(self.pipelines.items())}
+        return {'cameras': cameras, 'workers': self.workers, 'process_fps': self.worker_rate.rate()}
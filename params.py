@@ -0,0 +1,180 @@
+import configparser
+import dataclasses
+import os
+import threading
+from dataclasses import dataclass
+
+# settings.ini section holding the detection parameters
+SECTION = 'Settings'
+
+# Layout version ParameterStore.save writes as settings_version; files without it predate the store
+SETTINGS_VERSION = 1
+
+# Widget defaults the app wrote before these settings reached detection, which used the
+# DetectionParams defaults instead. An unversioned file holding them loads the defaults.
+LEGACY_DEFAULTS = {'threshold': 100, 'houghcircle_param1': 100, 'houghcircle_param2': 30}
+
+# Ink angle backends selectable through angle_method
+ANGLE_METHODS = ('hough', 'hough_polar', 'orientation')
+
+
+@dataclass(frozen=True)
+class DetectionParams:
+    """ One immutable set of detection parameters, keyed like settings.ini.
+
+    `version` goes up by one on every change made through ParameterStore,
+    so a consumer can tell with one integer compare whether anything moved.
+    """
+    houghcircle_param1: int = 75
+    houghcircle_param2: int = 80
+    canny_threshold: int = 75
+    # HoughLines vote threshold (the settings page's Threshold slider)
+    threshold: int = 90
+    group_angle_threshold: float = 5.0
+    group_dist_threshold: float = 100.0
+    houghlinesp_min_line_length: int = 50
+    houghlinesp_max_line_gap: int = 10
+    angle_method: str = 'hough'
+    # Half-width in px of the edge band the Hough ink angle is refined on (Imgpr.refine_ink_angle), 0 to skip
+    refine_band: int = 12
+    version: int = 0
+
+    def __post_init__(self):
+        if self.angle_method not in ANGLE_METHODS:
+            raise ValueError(f"Unknown angle method: {self.angle_method}")
+
+    def to_dict(self):
+        values = dataclasses.asdict(self)
+        del values['version']
+        return values
+
+    def replace(self, **changes):
+        """ Copy with the given fields changed and converted to their declared types. """
+        fields = {field.name: field for field in dataclasses.fields(self)}
+        typed = {}
+        for name, value in changes.items():
+            if name not in fields or name == 'version':
+                raise KeyError(f"Unknown parameter: {name}")
+            typed[name] = fields[name].type(value)
+        # Values are checked by __post_init__ on the new object
+        return dataclasses.replace(self, **typed)
+
+    def changed(self, other):
+        """ Names of the parameters that differ from `other`, version excluded. """
+        mine = self.to_dict()
+        theirs = other.to_dict()
+        return {name for name in mine if mine[name] != theirs[name]}
+
+
+# Parameters each cached stage depends on, see Imgpr.sync_params
+CIRCLE_PARAMS = frozenset({'houghcircle_param1', 'houghcircle_param2'})
+ANGLE_PARAMS = frozenset({'canny_threshold', 'threshold', 'group_angle_threshold', 'group_dist_threshold', 'angle_method',
+                          'refine_band'})
+
+
+class ParameterStore():
+    """ Holder of the current DetectionParams, shared between the UI and processing threads.
+
+    Readers take `current` once per frame and use that snapshot for the
+    whole frame; writers build a new object and swap the reference, so a
+    frame never sees half an update.
+    """
+
+    def __init__(self, params=None):
+        self.current = params or DetectionParams()
+        self._lock = threading.Lock()
+
+    def update(self, **changes):
+        """ Apply changes. The version only goes up if a value actually changed. Returns the current params. """
+        with self._lock:
+            params = self.current.replace(**changes)
+            if params.changed(self.current):
+                self.current = dataclasses.replace(params, version=self.current.version + 1)
+            return self.current
+
+    def load(self, path):
+        """ Update from the [Settings] section of an ini file. Unknown keys are ignored.
+
+        In a file without settings_version, values equal to LEGACY_DEFAULTS
+        are skipped so detection keeps the defaults it ran with before.
+        """
+        config = configparser.ConfigParser()
+        config.read(path)
+        if not config.has_section(SECTION):
+            return self.current
+        known = self.current.to_dict()
+        changes = {name: value for name, value in config.items(SECTION) if name in known}
+        if config.getint(SECTION, 'settings_version', fallback=0) < 1:
+            changes = {name: value for name, value in changes.items()
+                       if name not in LEGACY_DEFAULTS or int(value) != LEGACY_DEFAULTS[name]}
+        return self.update(**changes)
+
+    def save(self, path):
+        """ Write the parameters into the [Settings] section, keeping any other keys in the file. """
+        config = configparser.ConfigParser()
+        config.read(path)
+        if not config.has_section(SECTION):
+            config.add_section(SECTION)
+        config.set(SECTION, 'settings_version', str(SETTINGS_VERSION))
+        for name, value in self.current.to_dict().items():
+            config.set(SECTION, name, str(value))
+        with open(path, 'w') as f:
+            config.write(f)
+
+
+class SettingsWatcher():
+    """ Polls an ini file and loads it into a ParameterStore when it changes.
+
+    Polling the modification time keeps this free of extra dependencies;
+    an invalid file is reported and the previous parameters stay in use.
+    """
+
+    def __init__(self, store, path, interval=1.0):
+        self.store = store
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self.last_error = None
+        self._stamp = self._file_stamp()
+        # check() runs on the watcher thread and on the UI thread after a save
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='settings-watcher', daemon=True)
+        self._thread.start()
+
+    def check(self):
+        """ Reload if the file changed since the last check. Returns True if it was reloaded. """
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp is None or stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            try:
+                self.store.load(self.path)
+            except (configparser.Error, KeyError, ValueError) as e:
+                self.last_error = str(e)
+                print(f"Failed to reload {self.path}: {e}")
+                return False
+            self.reloads += 1
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
@@ -0,0 +1,258 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# What a full FrameQueue does with a new item
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+
+# Pause after an empty or failed capture so a camera that returns at once does not spin the loop
+CAPTURE_BACKOFF = 0.001
+
+# Upper bounds of the latency histogram buckets, in seconds (+Inf is implied)
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+
+class FrameQueue():
+    """ Bounded queue joining two pipeline stages. """
+
+    def __init__(self, maxsize=2, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item, timeout=None):
+        """ Add an item, applying the drop policy when full. Returns False if the item was not queued. """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                elif not self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout):
+                    self.dropped += 1
+                    return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def wait_for_space(self, timeout=None):
+        """ Wait until an item fits. Returns False on timeout; nothing is counted as dropped. """
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._items) < self.maxsize, timeout)
+
+    def get(self, timeout=None):
+        """ Remove and return the oldest item, or None on timeout. """
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) > 0, timeout):
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def get_latest(self):
+        """ Remove all items and return the newest one, or None if empty. """
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+            return item
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageTimer():
+    """ Running latency statistics and histogram for one pipeline stage. """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.last = seconds
+            self.max = max(self.max, seconds)
+            self.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+
+    def snapshot(self):
+        """ Return count, last/mean/max latency in milliseconds and the histogram. """
+        with self._lock:
+            mean = self.total / self.count if self.count else 0.0
+            return {'count': self.count, 'last_ms': self.last * 1000, 'mean_ms': mean * 1000, 'max_ms': self.max * 1000,
+                    'total_s': self.total, 'buckets': list(self.buckets), 'bucket_counts': list(self.bucket_counts)}
+
+
+class RateMeter():
+    """ Events per second over a sliding window of the last events. """
+
+    def __init__(self, window=30):
+        self._times = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def tick(self):
+        with self._lock:
+            self._times.append(time.perf_counter())
+
+    def rate(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            span = self._times[-1] - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+class FramePipeline():
+    """ Capture thread -> detection thread -> latest result for the GUI.
+
+    The camera only needs a capture_frame() method returning a gray numpy
+    frame or None, and the processor a process_frame(img) method returning
+    a result dict (see Imgpr.process_frame). Result centers are in sensor
+    coordinates; 'offset' is where the frame sits on the sensor.
+
+    start(process=False) only starts the capture thread; the owner then
+    calls process_next() from its own threads (see multicam.CameraManager).
+    on_frame, if set, is called after each frame is queued.
+    """
+
+    def __init__(self, camera, processor, queue_size=2, policy=DROP_OLDEST):
+        self.camera = camera
+        self.processor = processor
+        self.frame_queue = FrameQueue(queue_size, policy)
+        self.result_queue = FrameQueue(queue_size, policy)
+        self.timers = {'capture': StageTimer(), 'process': StageTimer(), 'display': StageTimer()}
+        self.exceptions = {'capture': 0, 'process': 0, 'display': 0}
+        self.capture_rate = RateMeter()
+        self.process_rate = RateMeter()
+        self.display_rate = RateMeter()
+        self._running = threading.Event()
+        self._threads = []
+        self._frame_id = 0
+        self._last_offset = (0, 0)
+        self.on_frame = None
+
+    def start(self, process=True):
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._threads = [threading.Thread(target=self._capture_loop, name='capture', daemon=True)]
+        if process:
+            self._threads.append(threading.Thread(target=self._process_loop, name='process', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running.clear()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def is_running(self):
+        return self._running.is_set()
+
+    def _capture_loop(self):
+        while self._running.is_set():
+            t0 = time.perf_counter()
+            try:
+                frame = self.camera.capture_frame()
+            except Exception as e:
+                self.exceptions['capture'] += 1
+                print(f"Capture failed: {e}")
+                time.sleep(CAPTURE_BACKOFF)
+                continue
+            if frame is None:
+                time.sleep(CAPTURE_BACKOFF)
+                continue
+            self.timers['capture'].add(time.perf_counter() - t0)
+            self.capture_rate.tick()
+
+            self._frame_id += 1
+            # Sensor position of the frame when the camera crops to an ROI (see AutoRoiCamera)
+            offset = getattr(self.camera, 'frame_offset', (0, 0))
+            self._put(self.frame_queue, {'frame_id': self._frame_id, 'timestamp': time.time(), 'frame': frame, 'offset': offset})
+            if self.on_frame is not None:
+                self.on_frame(self)
+
+    def _process_loop(self):
+        while self._running.is_set():
+            self.process_next(timeout=0.1)
+
+    def process_next(self, timeout=None):
+        """ Process the oldest queued frame. Returns False if there was none within timeout. """
+        item = self.frame_queue.get(timeout=timeout)
+        if item is None:
+            return False
+
+        if item['offset'] != self._last_offset:
+            # Processor state is in frame coordinates, move it along with the ROI
+            if hasattr(self.processor, 'shift_origin'):
+                self.processor.shift_origin(self._last_offset[0] - item['offset'][0], self._last_offset[1] - item['offset'][1])
+            self._last_offset = item['offset']
+
+        t0 = time.perf_counter()
+        try:
+            result = self.processor.process_frame(item['frame'])
+        except Exception as e:
+            self.exceptions['process'] += 1
+            print(f"Processing failed on frame {item['frame_id']}: {e}")
+            return True
+        self.timers['process'].add(time.perf_counter() - t0)
+        self.process_rate.tick()
+
+        result.update(item)
+        if result['center'] is not None and item['offset'] != (0, 0):
+            result['center'] = (result['center'][0] + item['offset'][0], result['center'][1] + item['offset'][1])
+        if hasattr(self.camera, 'on_result'):
+            self.camera.on_result(result)
+        self._put(self.result_queue, result)
+        return True
+
+    def _put(self, queue, item):
+        """ Queue an item. Under BLOCK, wait for room for as long as the pipeline runs. """
+        if queue.policy != BLOCK:
+            return queue.put(item, timeout=0.1)
+        while self._running.is_set():
+            # Only this stage puts into the queue, so the room is still there
+            if queue.wait_for_space(timeout=0.1):
+                return queue.put(item)
+        # Stopped while full
+        return queue.put(item, timeout=0)
+
+    def latest_result(self):
+        """ Newest processed frame for the display stage, or None if nothing new. """
+        return self.result_queue.get_latest()
+
+    def record_display(self, seconds):
+        """ Called by the display stage after painting a frame. """
+        self.timers['display'].add(seconds)
+        self.display_rate.tick()
+
+    def stats(self):
+        """ Per-stage timing plus FPS, queue depth, drop and exception counters. """
+        stats = {name: timer.snapshot() for name, timer in self.timers.items()}
+        stats['fps'] = {'capture': self.capture_rate.rate(), 'process': self.process_rate.rate(), 'display': self.display_rate.rate()}
+        stats['exceptions'] = dict(self.exceptions)
+        stats['frame_queue'] = {'depth': self.frame_queue.qsize(), 'dropped': self.frame_queue.dropped}
+        stats['result_queue'] = {'depth': self.result_queue.qsize(), 'dropped': self.result_queue.dropped}
+        if hasattr(self.camera, 'get_statistics'):
+            stats['camera'] = self.camera.get_statistics()
+        return stats
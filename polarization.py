@@ -0,0 +1,130 @@
+import cv2
+import numpy as np
+
+# Polarizer angle of each pixel in a 2x2 super-pixel (Sony IMX250MZR/IMX253MZR layout)
+DEFAULT_MOSAIC = ((90, 45), (135, 0))
+
+
+class PolarizationEngine():
+    """ Stokes parameters, AoLP and DoLP from the four polarizer channels.
+
+    All planes are float32 and allocated once per resolution, so process()
+    can run every frame. Angles are in degrees [0, 180), measured like the
+    ink angle: from the image x axis towards +y.
+    """
+
+    def __init__(self, mosaic=DEFAULT_MOSAIC, min_intensity=10.0):
+        self.mosaic = mosaic
+        self.min_intensity = min_intensity
+        self._shape = None
+        self._mask_key = None
+
+    def _allocate(self, shape):
+        if self._shape == shape:
+            return
+        self._shape = shape
+        self.planes = {angle: np.empty(shape, dtype=np.float32) for angle in (0, 45, 90, 135)}
+        self.s0 = np.empty(shape, dtype=np.float32)
+        self.s1 = np.empty(shape, dtype=np.float32)
+        self.s2 = np.empty(shape, dtype=np.float32)
+        self.aolp = np.empty(shape, dtype=np.float32)
+        self.dolp = np.empty(shape, dtype=np.float32)
+        self.magnitude = np.empty(shape, dtype=np.float32)
+        self.mask = np.empty(shape, dtype=np.uint8)
+        self._mask_key = None
+
+    def demosaic(self, raw):
+        """ Split a raw 2x2 polarization-mosaic frame into four half-resolution float32 planes. """
+        self._allocate((raw.shape[0] // 2, raw.shape[1] // 2))
+        h, w = self._shape
+        for row in range(2):
+            for col in range(2):
+                np.copyto(self.planes[self.mosaic[row][col]], raw[row:2*h:2, col:2*w:2], casting='unsafe')
+        return self.planes
+
+    def set_planes(self, i0, i45, i90, i135):
+        """ Load four full-resolution polarizer images (e.g. images/p0.png ... p135.png). """
+        self._allocate(i0.shape[:2])
+        for angle, img in ((0, i0), (45, i45), (90, i90), (135, i135)):
+            np.copyto(self.planes[angle], img, casting='unsafe')
+        return self.planes
+
+    def stokes(self):
+        """ S0/S1/S2, AoLP and DoLP of the loaded planes. """
+        p = self.planes
+        cv2.add(p[0], p[45], dst=self.s0)
+        cv2.add(self.s0, p[90], dst=self.s0)
+        cv2.add(self.s0, p[135], dst=self.s0)
+        cv2.multiply(self.s0, 0.5, dst=self.s0)
+        cv2.subtract(p[0], p[90], dst=self.s1)
+        cv2.subtract(p[45], p[135], dst=self.s2)
+
+        # AoLP = atan2(S2, S1) / 2, DoLP = sqrt(S1^2 + S2^2) / S0
+        cv2.cartToPolar(self.s1, self.s2, magnitude=self.magnitude, angle=self.aolp, angleInDegrees=True)
+        cv2.multiply(self.aolp, 0.5, dst=self.aolp)
+        cv2.max(self.s0, self.min_intensity, dst=self.dolp)
+        cv2.divide(self.magnitude, self.dolp, dst=self.dolp)
+        return self.s0, self.s1, self.s2, self.aolp, self.dolp
+
+    def disc_mask(self, center=None, radius=None):
+        """ Mask of the disc in plane coordinates, redrawn only when the circle changes. """
+        key = (center, radius)
+        if key != self._mask_key:
+            if center is None:
+                self.mask.fill(255)
+            else:
+                self.mask.fill(0)
+                cv2.circle(self.mask, (int(center[0]), int(center[1])), int(radius), 255, -1)
+            self._mask_key = key
+        return self.mask
+
+    def axis_angle(self, center=None, radius=None, method='mean', bins=180):
+        """ Robust polarizer axis over the disc.
+
+        'mean' is the circular mean of the doubled angle, weighted by the
+        polarized intensity sqrt(S1^2 + S2^2), i.e. the AoLP of the summed
+        Stokes vector. 'histogram' takes the peak of the weighted AoLP
+        histogram and refines it with the circular mean of the pixels
+        within two bins of the peak, which ignores off-axis regions.
+        Returns a dict with axis_angle, dolp and confidence (0..1).
+        """
+        mask = self.disc_mask(center, radius)
+        valid = (mask > 0) & (self.s0 >= self.min_intensity)
+        if not valid.any():
+            return {'axis_angle': None, 'dolp': None, 'confidence': 0.0}
+
+        s0_sum = float(self.s0[valid].sum())
+        s1_sum = float(self.s1[valid].sum())
+        s2_sum = float(self.s2[valid].sum())
+        polarized = float(self.magnitude[valid].sum())
+        dolp = float(np.hypot(s1_sum, s2_sum)) / s0_sum
+        # Resultant length of the doubled angles: 1 when every pixel agrees
+        confidence = min(float(np.hypot(s1_sum, s2_sum)) / polarized, 1.0) if polarized > 0 else 0.0
+
+        if method == 'histogram':
+            aolp = self.aolp[valid]
+            weights = self.magnitude[valid]
+            bin_width = 180.0 / bins
+            hist, _ = np.histogram(aolp, bins=bins, range=(0.0, 180.0), weights=weights)
+            peak = (int(np.argmax(hist)) + 0.5) * bin_width
+            # Distance to the peak on the 180 degree circle
+            near = np.abs((aolp - peak + 90.0) % 180.0 - 90.0) <= 2 * bin_width
+            doubled = np.radians(2 * aolp[near])
+            angle = float(np.degrees(0.5 * np.arctan2((weights[near] * np.sin(doubled)).sum(),
+                                                      (weights[near] * np.cos(doubled)).sum()))) % 180.0
+        else:
+            angle = float(np.degrees(0.5 * np.arctan2(s2_sum, s1_sum))) % 180.0
+
+        return {'axis_angle': angle, 'dolp': dolp, 'confidence': confidence}
+
+    def process(self, raw, center=None, radius=None, method='mean'):
+        """ Demosaic a raw polarization frame and return the axis estimate.
+
+        center and radius are in raw-frame pixels.
+        """
+        self.demosaic(raw)
+        self.stokes()
+        if center is not None:
+            center = (center[0] / 2, center[1] / 2)
+            radius = radius / 2
+        return self.axis_angle(center, radius, method)
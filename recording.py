@@ -0,0 +1,442 @@
+""" Recording and replay of raw camera streams.
+
+Usage: python recording.py info recordings/SIM0-20240101-120000
+
+A recording is three files sharing a base path:
+  <path>.frames  the frames back to back, raw pixels or PNG, append-only
+  <path>.index   a 16 byte header, then one INDEX_DTYPE record per frame
+  <path>.json    recording-level metadata (serial, start time, codec)
+Both binary files are only ever appended to, so a recording cut short by
+a crash stays readable up to the last complete frame. Replay memory-maps
+the frames file; raw frames come back as read-only views into the map.
+"""
+import argparse
+import json
+import mmap
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from camera_base import Camera
+from pipeline import FrameQueue, DROP_NEWEST
+
+MAGIC = b'PAFREC\x00\x01'
+
+# How a frame is stored in the .frames file
+CODEC_RAW = 0
+CODEC_PNG = 1
+COMPRESSIONS = {'raw': CODEC_RAW, 'png': CODEC_PNG}
+
+INDEX_DTYPE = np.dtype([
+    ('frame_id', '<u8'),
+    # Camera timestamp (device clock for IDSCamera), only differences are meaningful
+    ('timestamp_ns', '<i8'),
+    # time.time() when the frame was captured
+    ('host_time', '<f8'),
+    ('offset', '<u8'),
+    ('nbytes', '<u4'),
+    ('width', '<u2'),
+    ('height', '<u2'),
+    # Sensor position of the frame when the camera crops to an ROI
+    ('roi_x', '<u2'),
+    ('roi_y', '<u2'),
+    ('codec', 'u1'),
+    ('itemsize', 'u1'),
+])
+HEADER_SIZE = 16
+
+
+def recording_paths(path):
+    """ (.frames, .index, .json) paths of a recording, given its base path or any of the three files. """
+    base, ext = os.path.splitext(path)
+    if ext not in ('.frames', '.index', '.json'):
+        base = path
+    return base + '.frames', base + '.index', base + '.json'
+
+
+def encode_png(frame):
+    ok, encoded = cv2.imencode('.png', frame, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise RuntimeError("PNG encoding failed")
+    return encoded.data
+
+
+class FrameRecorder():
+    """ Appends frames to a recording from a writer thread.
+
+    write() only queues the frame, so the capture thread never waits on
+    the disk or the encoder. When the writer falls `queue_size` frames
+    behind, new frames are dropped and counted rather than stalling
+    acquisition. With compression='png' the frames are PNG encoded (level
+    1, lossless) on `encoders` threads, OpenCV releases the GIL while
+    encoding, and written in capture order. The files are flushed every
+    `flush_every` frames and closed by the writer thread after its last
+    write.
+    """
+
+    def __init__(self, path, compression='raw', queue_size=64, flush_every=25, metadata=None, encoders=2):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.path = path
+        self.compression = compression
+        self.codec = COMPRESSIONS[compression]
+        self.flush_every = flush_every
+        self.encoders = encoders
+        self.metadata = metadata or {}
+        self.queue = FrameQueue(queue_size, DROP_NEWEST)
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.raw_bytes = 0
+        self.error_count = 0
+        self.last_error = None
+        # Set when close() stopped the writer before the queue was written
+        self.truncated = False
+        self._frame_id = 0
+        self._frames = None
+        self._index = None
+        self._encoder = None
+        self._running = threading.Event()
+        self._abort = threading.Event()
+        self._thread = None
+
+    def open(self):
+        frames_path, index_path, meta_path = recording_paths(self.path)
+        directory = os.path.dirname(frames_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._frames = open(frames_path, 'xb')
+        self._index = open(index_path, 'xb')
+        self._index.write(MAGIC + np.array([INDEX_DTYPE.itemsize, 0], '<u4').tobytes())
+        with open(meta_path, 'x') as f:
+            json.dump(dict(self.metadata, created=time.time(), compression=self.compression), f, indent=2)
+        if self.codec == CODEC_PNG:
+            self._encoder = ThreadPoolExecutor(self.encoders, thread_name_prefix='recorder-encode')
+        self._running.set()
+        self._thread = threading.Thread(target=self._write_loop, name='recorder', daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, frame, timestamp_ns=None, offset=(0, 0)):
+        """ Queue a gray frame the caller will not modify. Returns False if it was dropped. """
+        if not self._running.is_set():
+            return False
+        self._frame_id += 1
+        if timestamp_ns is None:
+            timestamp_ns = time.perf_counter_ns()
+        return self.queue.put((self._frame_id, timestamp_ns, time.time(), frame, offset), timeout=0)
+
+    def _write_loop(self):
+        try:
+            self._drain()
+        finally:
+            if self._encoder is not None:
+                self._encoder.shutdown(cancel_futures=True)
+            try:
+                self._flush()
+            finally:
+                self._frames.close()
+                self._index.close()
+
+    def _drain(self):
+        # Frames handed to the encoders, oldest first
+        pending = deque()
+        # Keep going after close() until the queue is drained, unless close() gave up waiting
+        while not self._abort.is_set() and (self._running.is_set() or self.queue.qsize() > 0 or pending):
+            item = self.queue.get(timeout=0 if pending else 0.1)
+            if item is not None:
+                encoded = self._encoder.submit(encode_png, item[3]) if self._encoder is not None else None
+                pending.append((item, encoded))
+            # Write the oldest frame once it is encoded, or wait for it when there is nothing else to do
+            if pending and (item is None or len(pending) > self.encoders or pending[0][1] is None or pending[0][1].done()):
+                item, encoded = pending.popleft()
+                try:
+                    self._append(*item, data=encoded.result() if encoded is not None else None)
+                except Exception as e:
+                    self.error_count += 1
+                    self.last_error = str(e)
+                    print(f"Recording failed on frame {item[0]}: {e}")
+
+    def _append(self, frame_id, timestamp_ns, host_time, frame, offset, data=None):
+        frame = np.ascontiguousarray(frame)
+        if data is None:
+            data = frame.data
+
+        record = np.zeros(1, INDEX_DTYPE)
+        record['frame_id'] = frame_id
+        record['timestamp_ns'] = timestamp_ns
+        record['host_time'] = host_time
+        record['offset'] = self.bytes_written
+        record['nbytes'] = data.nbytes
+        record['height'], record['width'] = frame.shape[:2]
+        record['roi_x'], record['roi_y'] = offset
+        record['codec'] = self.codec
+        record['itemsize'] = frame.itemsize
+
+        # Frame first, then its index record, so the index never points past the data
+        self._frames.write(data)
+        self._index.write(record.tobytes())
+        self.bytes_written += data.nbytes
+        self.raw_bytes += frame.nbytes
+        self.frames_written += 1
+        if self.frames_written % self.flush_every == 0:
+            self._flush()
+
+    def _flush(self):
+        self._frames.flush()
+        self._index.flush()
+
+    def close(self, timeout=5.0):
+        """ Stop taking frames and wait up to `timeout` s for the queued ones to be written.
+
+        If the writer is still busy after that, it stops after the frame in
+        hand and closes the files itself; the recording is marked truncated.
+        """
+        if self._thread is None:
+            return
+        self._running.clear()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._abort.set()
+            self.truncated = True
+            print(f"Recording {self.path} truncated, the writer did not finish within {timeout} s")
+        self._thread = None
+
+    def stats(self):
+        return {
+            'recorded': self.frames_written,
+            'record_dropped': self.queue.dropped,
+            'record_queue': self.queue.qsize(),
+            'record_bytes': self.bytes_written,
+            'record_errors': self.error_count,
+            'record_truncated': self.truncated,
+        }
+
+
+class RecordingCamera():
+    """ Camera wrapper that hands every captured frame to a FrameRecorder.
+
+    Wrap the outermost camera (e.g. AutoRoiCamera) so the recorded frames
+    carry their ROI offset. The frame goes to the pipeline and the
+    recorder at once; the pipeline only reads its input frames, so no copy
+    is made.
+    """
+
+    def __init__(self, camera, recorder):
+        self.camera = camera
+        self.recorder = recorder
+
+    def capture_frame(self):
+        frame = self.camera.capture_frame()
+        if frame is not None:
+            self.recorder.write(frame, getattr(self.camera, 'last_timestamp_ns', None),
+                                getattr(self.camera, 'frame_offset', (0, 0)))
+        return frame
+
+    def get_statistics(self):
+        # Frame counters only, they end up in the camera_frames_total metric
+        stats = dict(self.camera.get_statistics())
+        recorder = self.recorder.stats()
+        stats['recorded'] = recorder['recorded']
+        stats['record_dropped'] = recorder['record_dropped']
+        return stats
+
+    def __getattr__(self, name):
+        # frame_offset, on_result, dispose, ... go to the wrapped camera
+        return getattr(self.camera, name)
+
+
+class Recording():
+    """ Read access to a recording. frame(i) is a read-only view into the mapped file for raw frames. """
+
+    def __init__(self, path):
+        self.path = path
+        frames_path, index_path, meta_path = recording_paths(path)
+        with open(index_path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{index_path} is not a recording index")
+        if int(np.frombuffer(header, '<u4', 1, len(MAGIC))[0]) != INDEX_DTYPE.itemsize:
+            raise ValueError(f"{index_path} has an unsupported index layout")
+        count = (os.path.getsize(index_path) - HEADER_SIZE) // INDEX_DTYPE.itemsize
+        index = np.fromfile(index_path, INDEX_DTYPE, count, offset=HEADER_SIZE)
+
+        size = os.path.getsize(frames_path)
+        # Drop records whose frame did not make it to disk (recording cut short)
+        self.index = index[index['offset'] + index['nbytes'] <= size]
+        self._file = open(frames_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+        self.metadata = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.metadata = json.load(f)
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        record = self.index[i]
+        offset, nbytes = int(record['offset']), int(record['nbytes'])
+        if record['codec'] == CODEC_PNG:
+            return cv2.imdecode(np.frombuffer(self._map, np.uint8, nbytes, offset), cv2.IMREAD_UNCHANGED)
+        dtype = np.uint8 if record['itemsize'] == 1 else np.dtype(f"<u{record['itemsize']}")
+        return np.frombuffer(self._map, dtype, nbytes // record['itemsize'], offset).reshape(record['height'], record['width'])
+
+    def offset(self, i):
+        return int(self.index['roi_x'][i]), int(self.index['roi_y'][i])
+
+    def duration(self):
+        """ Seconds between the first and the last frame. """
+        if len(self) < 2:
+            return 0.0
+        return (int(self.index['timestamp_ns'][-1]) - int(self.index['timestamp_ns'][0])) / 1e9
+
+    def fps(self):
+        duration = self.duration()
+        return (len(self) - 1) / duration if duration > 0 else 0.0
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Frames handed out are still alive, the map goes when they do
+                pass
+            self._map = None
+        self._file.close()
+
+
+class ReplayCamera(Camera):
+    """ Camera backend feeding a recording back into the pipeline.
+
+    Frames are paced by their recorded timestamps divided by `speed`, or
+    delivered as fast as they are taken with speed=None. Each frame comes
+    with its recorded ROI offset (frame_offset), so results land in the
+    same sensor coordinates as on the line. With `loop` the recording
+    starts over at the end, otherwise capture_frame() returns None from
+    then on and `finished` is set.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, serial='REPLAY'):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.serial = serial
+        self.recording = None
+        self.frame_index = 0
+        self.frame_offset = (0, 0)
+        self.finished = False
+        self._running = False
+        self._next_ns = None
+        self.delivered_frames = 0
+
+    def open_camera(self):
+        try:
+            self.recording = Recording(self.path)
+            fps = self.recording.fps()
+            self.frame_period_ns = 1e9 / fps if fps else None
+            return len(self.recording) > 0
+        except Exception as e:
+            self.record_error(e)
+            print(f"Exception: {e}")
+        return False
+
+    def start_acquisition(self):
+        self._running = True
+        self._next_ns = None
+        return True
+
+    def stop_acquisition(self):
+        self._running = False
+        return True
+
+    def _wait_for_frame(self, timestamp_ns):
+        if not self.speed:
+            return
+        if self._next_ns is None or self.last_timestamp_ns is None or timestamp_ns < self.last_timestamp_ns:
+            # First frame or the recording looped: start a new schedule
+            self._next_ns = time.perf_counter_ns()
+            return
+        self._next_ns += (timestamp_ns - self.last_timestamp_ns) / self.speed
+        now = time.perf_counter_ns()
+        if self._next_ns > now:
+            time.sleep((self._next_ns - now) / 1e9)
+        elif self.frame_period_ns and now - self._next_ns > self.frame_period_ns / self.speed:
+            # The consumer fell behind, restart the schedule instead of bursting
+            self.late_frames += 1
+            self._next_ns = now
+
+    def capture_frame(self):
+        if not self._running or self.finished:
+            return None
+        try:
+            if self.frame_index >= len(self.recording):
+                if not self.loop:
+                    self.finished = True
+                    return None
+                self.frame_index = 0
+            i = self.frame_index
+            self.frame_index += 1
+            timestamp_ns = int(self.recording.index['timestamp_ns'][i])
+            self._wait_for_frame(timestamp_ns)
+            self.last_timestamp_ns = timestamp_ns
+            self.frame_offset = self.recording.offset(i)
+            self.delivered_frames += 1
+            return self.recording.frame(i)
+        except Exception as e:
+            self.record_error(e)
+            print(f"Exception: {e}")
+        return None
+
+    def get_statistics(self):
+        """ Same keys as IDSCamera.get_statistics. """
+        return {
+            'late': self.late_frames,
+            'incomplete_local': 0,
+            'errors': self.error_count,
+            'delivered': self.delivered_frames,
+            'dropped': 0,
+            'lost': 0,
+            'incomplete': 0,
+            'underruns': 0,
+        }
+
+    def dispose(self):
+        self._running = False
+        if self.recording is not None:
+            self.recording.close()
+            self.recording = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help='summarize a recording')
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    recording = Recording(args.path)
+    index = recording.index
+    print(f"frames      {len(recording)}")
+    print(f"duration    {recording.duration():.2f} s ({recording.fps():.1f} FPS)")
+    if len(recording):
+        sizes = sorted({(int(w), int(h)) for w, h in zip(index['width'], index['height'])})
+        stored = int(index['nbytes'].sum())
+        raw = int((index['width'].astype(np.int64) * index['height'] * index['itemsize']).sum())
+        print(f"sizes       {', '.join(f'{w}x{h}' for w, h in sizes)}")
+        print(f"stored      {stored / 1e6:.1f} MB ({raw / stored:.2f}x compression)")
+        gaps = np.diff(index['frame_id'].astype(np.int64)) - 1
+        print(f"gaps        {int(gaps.sum())} frames missing from the sequence")
+    for key, value in recording.metadata.items():
+        print(f"{key:<11} {value}")
+    recording.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+
+import cv2
+
+
+class SceneCache():
+    """ Change-detection gate in front of Imgpr: static scenes reuse the last result.
+
+    Each processed frame is reduced to a thumbnail, `scale` times smaller
+    per side (INTER_AREA, so every cell is the mean of scale x scale
+    pixels and sensor noise averages out). A new frame whose thumbnail
+    differs from a cached one by at most `threshold` gray levels in every
+    cell gets that entry's result instead of a detection. The largest cell
+    difference is used rather than the mean, since turning the part only
+    changes the few cells along the ink line. Frames are compared with the
+    frame that was detected, not the previous one, so a slow drift adds up
+    until it is detected.
+
+    A new entry is only served once a second detection on a matching frame
+    agrees with it (same circle found, ink angle within `agreement`
+    degrees), so a one-off bad detection is not repeated for seconds; a
+    disagreeing detection replaces the entry instead.
+
+    At most `max_entries` scenes are kept, least recently matched first
+    out. An entry expires `max_age` seconds after its detection or after
+    `max_hits` reuses, whichever comes first, so even a static scene is
+    detected again now and then. Parameter changes and ROI moves clear the
+    cache. Same process_frame(img) interface as Imgpr; results carry
+    'cached' True when reused.
+    """
+
+    def __init__(self, imgpr, threshold=8, scale=16, max_entries=4, max_age=5.0, max_hits=250, agreement=1.0):
+        self.imgpr = imgpr
+        self.threshold = threshold
+        self.agreement = agreement
+        self.scale = scale
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.max_hits = max_hits
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._next_key = 0
+
+    def thumbnail(self, img):
+        size = (max(img.shape[1] // self.scale, 1), max(img.shape[0] // self.scale, 1))
+        return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+    def _lookup(self, thumb, shape):
+        """ (key, entry) of the freshest matching entry or (None, None), dropping expired ones on the way. """
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if now - entry['time'] > self.max_age or entry['hits'] >= self.max_hits:
+                del self._entries[key]
+                self.expired += 1
+                continue
+            if entry['shape'] == shape and cv2.absdiff(entry['thumb'], thumb).max() <= self.threshold:
+                self._entries.move_to_end(key)
+                return key, entry
+        return None, None
+
+    def _agrees(self, a, b):
+        if (a['center'] is None) != (b['center'] is None) or (a['ink_angle'] is None) != (b['ink_angle'] is None):
+            return False
+        if a['ink_angle'] is None:
+            return True
+        return abs((a['ink_angle'] - b['ink_angle'] + 90.0) % 180.0 - 90.0) <= self.agreement
+
+    def process_frame(self, img):
+        self.sync_params()
+        thumb = self.thumbnail(img)
+        key, entry = self._lookup(thumb, img.shape)
+        if entry is not None and entry['confirmed']:
+            entry['hits'] += 1
+            self.hits += 1
+            return dict(entry['result'], cached=True)
+
+        self.misses += 1
+        result = self.imgpr.process_frame(img)
+        if entry is not None and self._agrees(entry['result'], result):
+            entry['confirmed'] = True
+        else:
+            if key is not None:
+                del self._entries[key]
+            # Stored as a copy, the caller may add to the returned dict
+            self._entries[self._next_key] = {'thumb': thumb, 'shape': img.shape, 'result': dict(result),
+                                             'time': time.monotonic(), 'hits': 0, 'confirmed': False}
+            self._next_key += 1
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        result['cached'] = False
+        return result
+
+    def sync_params(self):
+        """ Imgpr.sync_params, clearing the cache when any parameter changed. """
+        changed = self.imgpr.sync_params() if hasattr(self.imgpr, 'sync_params') else frozenset()
+        if changed:
+            self.clear()
+        return changed
+
+    def shift_origin(self, dx, dy):
+        # Cached results are in the old frame coordinates
+        self.clear()
+        if hasattr(self.imgpr, 'shift_origin'):
+            self.imgpr.shift_origin(dx, dy)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'expired': self.expired, 'entries': len(self._entries),
+                'hit_rate': self.hits / total if total else 0.0}
@@ -0,0 +1,200 @@
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+
+from camera_base import Camera, IMAGE_EXTENSIONS
+from synthetic import make_disc_frame
+
+class SimulatedCamera(Camera):
+    """ Camera backend without hardware, for development and soak tests.
+
+    `source` is an image file, a directory of images, a video file, or None
+    for a synthetic disc that turns by `rotation` degrees per frame. Frames
+    are paced at `fps` with up to `jitter` periods of random delay per
+    frame. `drop_rate` of the frames are skipped, as if the driver dropped
+    them, and `incomplete_rate` come back as None like an incomplete buffer
+    from IDSCamera. The ROI methods crop the source, so AutoRoiCamera works
+    against this backend too.
+    """
+
+    def __init__(self, source=None, fps=25.0, width=1216, height=1024, jitter=0.0,
+                 drop_rate=0.0, incomplete_rate=0.0, rotation=1.0, noise=0.0, seed=None, serial='SIM0'):
+        super().__init__()
+        self.source = source
+        self.serial = serial
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.incomplete_rate = incomplete_rate
+        self.rotation = rotation
+        self.noise = noise
+        self._random = random.Random(seed)
+        self._rng = np.random.default_rng(seed)
+        self._images = None
+        self._video = None
+        self._noise_bank = None
+        self._roi = (0, 0, width, height)
+        self._running = False
+        self._next_ns = None
+        self.frame_period_ns = 1e9 / fps if fps else None
+        self.frame_index = 0
+        # Angle the last synthetic frame was drawn with, for accuracy checks
+        self.truth_angle = None
+        self.delivered_frames = 0
+        self.dropped_frames = 0
+        self.incomplete_frames = 0
+
+    def open_camera(self):
+        try:
+            if self.source is None:
+                return True
+            if os.path.isdir(self.source):
+                paths = sorted(os.path.join(self.source, name) for name in os.listdir(self.source)
+                               if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+                self._images = [self._fit(cv2.imread(path, cv2.IMREAD_GRAYSCALE)) for path in paths]
+                self._images = [img for img in self._images if img is not None]
+                return bool(self._images)
+            if os.path.splitext(self.source)[1].lower() in IMAGE_EXTENSIONS:
+                img = cv2.imread(self.source, cv2.IMREAD_GRAYSCALE)
+                self._images = [self._fit(img)] if img is not None else []
+                return bool(self._images)
+            self._video = cv2.VideoCapture(self.source)
+            return self._video.isOpened()
+        except Exception as e:
+            self.record_error(e)
+        return False
+
+    def _fit(self, img):
+        """ Resize a source image to the simulated sensor size. """
+        if img is None or img.shape == (self.height, self.width):
+            return img
+        return cv2.resize(img, (self.width, self.height), interpolation=cv2.INTER_AREA)
+
+    def _next_source_frame(self):
+        if self._images is not None:
+            return self._images[self.frame_index % len(self._images)]
+        if self._video is not None:
+            ok, frame = self._video.read()
+            if not ok:
+                # Loop the clip
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self._video.read()
+                if not ok:
+                    return None
+            if frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            return self._fit(frame)
+        self.truth_angle = (self.frame_index * self.rotation) % 180.0
+        frame = make_disc_frame(self.width, self.height, angle=self.truth_angle)
+        if self.noise > 0:
+            frame = cv2.add(frame, self._noise(), dtype=cv2.CV_8U)
+        return frame
+
+    def _noise(self):
+        """ One of a few pre-drawn noise fields. Drawing a fresh one per frame caps the rate near 25 FPS. """
+        if self._noise_bank is None:
+            self._noise_bank = [np.round(self._rng.normal(0, self.noise, (self.height, self.width))).astype(np.int16)
+                                for _ in range(4)]
+        return self._noise_bank[self.frame_index % len(self._noise_bank)]
+
+    def start_acquisition(self):
+        self._running = True
+        self._next_ns = time.perf_counter_ns()
+        self.last_timestamp_ns = None
+        return True
+
+    def stop_acquisition(self):
+        self._running = False
+        return True
+
+    def _wait_for_frame(self):
+        if not self.frame_period_ns:
+            return time.perf_counter_ns()
+        self._next_ns += self.frame_period_ns
+        delay = self._random.uniform(0, self.jitter) * self.frame_period_ns if self.jitter else 0
+        deadline = self._next_ns + delay
+        now = time.perf_counter_ns()
+        if deadline > now:
+            time.sleep((deadline - now) / 1e9)
+        elif now - self._next_ns > self.frame_period_ns:
+            # The consumer fell behind, restart the schedule instead of bursting
+            self._next_ns = now
+        return time.perf_counter_ns()
+
+    def capture_frame(self):
+        if not self._running:
+            return None
+        try:
+            while True:
+                timestamp_ns = self._wait_for_frame()
+                frame = self._next_source_frame()
+                self.frame_index += 1
+                if frame is None:
+                    return None
+                if self._random.random() < self.drop_rate:
+                    self.dropped_frames += 1
+                    continue
+                break
+
+            self.count_late_frame(timestamp_ns)
+
+            if self._random.random() < self.incomplete_rate:
+                self.incomplete_frames += 1
+                return None
+
+            self.delivered_frames += 1
+            x, y, width, height = self._roi
+            # Copy so the caller owns the frame, as with IDSCamera
+            return frame[y:y + height, x:x + width].copy()
+        except Exception as e:
+            self.record_error(e)
+            print(f"Exception: {e}")
+        return None
+
+    def get_roi(self):
+        return self._roi
+
+    def get_roi_constraints(self):
+        return {
+            'sensor_width': self.width,
+            'sensor_height': self.height,
+            'min_width': 256,
+            'min_height': 128,
+            'inc_x': 8,
+            'inc_y': 2,
+            'inc_width': 16,
+            'inc_height': 2,
+        }
+
+    def change_roi(self, x, y, width, height):
+        c = self.get_roi_constraints()
+        if x < 0 or y < 0 or width < c['min_width'] or height < c['min_height']:
+            return False
+        if x + width > self.width or y + height > self.height:
+            return False
+        self._roi = (x, y, width, height)
+        return True
+
+    def get_statistics(self):
+        """ Same keys as IDSCamera.get_statistics. """
+        return {
+            'late': self.late_frames,
+            'incomplete_local': self.incomplete_frames,
+            'errors': self.error_count,
+            'delivered': self.delivered_frames,
+            'dropped': self.dropped_frames,
+            'lost': 0,
+            'incomplete': self.incomplete_frames,
+            'underruns': 0,
+        }
+
+    def dispose(self):
+        self._running = False
+        if self._video is not None:
+            self._video.release()
+            self._video = None
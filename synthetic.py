@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+
+def make_disc_frame(width=1216, height=1024, center=None, radius=400, angle=0.0, noise=0.0,
+                    background=230, disc=170, ink=30, rng=None):
+    """ Gray frame of a polarizer disc with a dashed ink line through its center.
+
+    Looks like images/intensity.png: bright background, grey disc, dark
+    dashes. angle is in degrees measured the way Imgpr reports the ink
+    angle (image x axis towards +y), noise is the Gaussian sigma in gray
+    levels.
+    """
+    if center is None:
+        center = (width / 2, height / 2)
+    img = np.full((height, width), background, dtype=np.uint8)
+    cv2.circle(img, (int(round(center[0])), int(round(center[1]))), int(radius), disc, -1, lineType=cv2.LINE_AA)
+
+    # Four dashes along the axis, leaving the middle and the rim clear. Endpoints in
+    # 1/16 px (shift=4), whole pixels would tilt each dash by up to ~0.8 degrees
+    direction = np.array([np.cos(np.radians(angle)), np.sin(np.radians(angle))])
+    c = np.array(center, dtype=np.float64)
+    for start, end in ((-0.75, -0.57), (-0.43, -0.25), (0.25, 0.43), (0.57, 0.75)):
+        p1 = np.round((c + direction * start * radius) * 16).astype(int)
+        p2 = np.round((c + direction * end * radius) * 16).astype(int)
+        cv2.line(img, (int(p1[0]), int(p1[1])), (int(p2[0]), int(p2[1])),
+                 ink, max(int(radius / 50), 2), lineType=cv2.LINE_AA, shift=4)
+
+    if noise > 0:
+        rng = rng or np.random.default_rng()
+        noisy = img.astype(np.float32) + rng.normal(0, noise, img.shape).astype(np.float32)
+        img = np.clip(noisy, 0, 255).astype(np.uint8)
+    return img
+
+
+def angle_error(measured, truth):
+    """ Absolute difference of two line angles in degrees, on the 180 degree circle. """
+    return abs((measured - truth + 90.0) % 180.0 - 90.0)
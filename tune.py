@@ -0,0 +1,309 @@
+""" Offline parameter sweep for the detection stages over a labelled image set.
+
+Usage: python tune.py labels.csv [--search grid|bayes] [--trials N] [--workers N] [--write settings.ini]
+       python tune.py --synthetic 24 [...]
+
+labels.csv has a header and the columns path, angle and optionally
+center_x, center_y, radius; paths are relative to the CSV. --synthetic N
+uses N generated discs with known angles instead.
+
+Tuned settings.ini keys, in pipeline order:
+  houghcircle_param1, houghcircle_param2  disc detection (HoughCircles)
+  canny_threshold                         Canny upper threshold on the masked disc
+  threshold                               HoughLines vote threshold
+The angle is scored after Imgpr.refine_line, as the app reports it.
+Each stage's output is memoized on the parameters it depends on, so a
+circle is found once per (param1, param2), the masked disc and Canny
+edges are reused for every line threshold, and only HoughLines and the
+grouping run per full combination. The grid runs one image per task,
+Bayesian search (needs optuna) one image per task and trial. The
+loss is the mean ink angle error with a missed disc or angle counted
+as MISS_PENALTY degrees.
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing as mp
+import os
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from impl import Imgpr
+from params import ParameterStore
+from synthetic import make_disc_frame, angle_error
+
+# Sweep values per parameter for the grid search; the Bayesian search uses their min/max as bounds
+GRID = OrderedDict([
+    ('houghcircle_param1', [50, 75, 100, 125]),
+    ('houghcircle_param2', [40, 60, 80, 100]),
+    ('canny_threshold', [50, 75, 100, 125]),
+    ('threshold', [60, 90, 120, 150]),
+])
+
+MISS_PENALTY = 90.0
+
+_worker = None
+
+
+def load_labels(path):
+    """ Samples from a label CSV: dicts with path, angle and optional center/radius. """
+    base = os.path.dirname(os.path.abspath(path))
+    samples = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            sample = {'path': os.path.join(base, row['path']), 'angle': float(row['angle']), 'center': None, 'radius': None}
+            if row.get('center_x') and row.get('center_y'):
+                sample['center'] = (float(row['center_x']), float(row['center_y']))
+            if row.get('radius'):
+                sample['radius'] = float(row['radius'])
+            samples.append(sample)
+    return samples
+
+
+def synthetic_samples(count, seed=0):
+    """ Generated discs at random angles, positions and noise levels. """
+    rng = np.random.default_rng(seed)
+    samples = []
+    for _ in range(count):
+        center = (608 + rng.uniform(-60, 60), 512 + rng.uniform(-60, 60))
+        radius = rng.uniform(360, 420)
+        angle = rng.uniform(0, 180)
+        image = make_disc_frame(center=center, radius=radius, angle=angle, noise=rng.choice([0.0, 2.0, 4.0]), rng=rng)
+        samples.append({'path': None, 'image': image, 'angle': angle, 'center': center, 'radius': radius})
+    return samples
+
+
+class StageCache():
+    """ Bounded memo for one pipeline stage, least recently used entries go first. """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key, compute):
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.misses += 1
+        value = compute()
+        self._items[key] = value
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        """ Drop the entries and reset the hit/miss counts. """
+        self._items.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class SweepEvaluator():
+    """ Runs the detection stages for one sample and parameter set, memoizing each stage. """
+
+    def __init__(self, samples, cache_size=64):
+        self.samples = samples
+        self.imgpr = Imgpr()
+        self._images = {}
+        self.caches = {'circle': StageCache(cache_size), 'mask': StageCache(cache_size), 'edges': StageCache(cache_size)}
+
+    def image(self, i):
+        if i not in self._images:
+            sample = self.samples[i]
+            image = sample.get('image')
+            if image is None:
+                image = cv2.imread(sample['path'], cv2.IMREAD_GRAYSCALE)
+                if image is None:
+                    raise RuntimeError(f"Failed to read {sample['path']}")
+            self._images[i] = image
+        return self._images[i]
+
+    def circle(self, i, param1, param2):
+        def compute():
+            img = self.image(i)
+            return self.imgpr.single_circle(self.imgpr.detect_circle(img, img.shape[0]/8, param1=param1, param2=param2))
+        return self.caches['circle'].get((i, param1, param2), compute)
+
+    def masked(self, i, circle):
+        def compute():
+            img = self.image(i)
+            mask = np.zeros_like(img)
+            cv2.circle(mask, circle[0], circle[1], 255, -1)
+            return cv2.bitwise_and(img, mask)
+        return self.caches['mask'].get((i, circle), compute)
+
+    def edges(self, i, circle, canny_threshold):
+        return self.caches['edges'].get((i, circle, canny_threshold),
+                                        lambda: self.imgpr.canny(self.masked(i, circle), th2=canny_threshold))
+
+    def evaluate(self, i, params):
+        """ (angle error or MISS_PENALTY, center error or None) of one sample. """
+        sample = self.samples[i]
+        circle = self.circle(i, params['houghcircle_param1'], params['houghcircle_param2'])
+        if circle is None:
+            return MISS_PENALTY, None
+        center_error = None
+        if sample['center'] is not None:
+            center_error = float(np.hypot(circle[0][0] - sample['center'][0], circle[0][1] - sample['center'][1]))
+
+        edges = self.edges(i, circle, params['canny_threshold'])
+        line = self.imgpr.ink_line(edges, circle[0], th=params['threshold'])
+        if line is None:
+            return MISS_PENALTY, center_error
+        # Scored after refinement (none with refine_band 0), like the angle process_frame reports
+        angle = self.imgpr.refine_line(edges, circle[0], circle[1], line, band=self.imgpr.params.refine_band)[0]
+        return angle_error(angle, sample['angle']), center_error
+
+    def clear(self):
+        for cache in self.caches.values():
+            cache.clear()
+        self._images.clear()
+
+    def cache_stats(self):
+        return {name: (cache.hits, cache.misses) for name, cache in self.caches.items()}
+
+
+def grid_combinations(grid):
+    """ Every parameter combination, later parameters varying fastest so the earlier stages' caches hit. """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+def _init_worker(samples, cache_size):
+    global _worker
+    _worker = SweepEvaluator(samples, cache_size)
+
+
+def _evaluate_grid_image(args):
+    i, combinations = args
+    results = [_worker.evaluate(i, params) for params in combinations]
+    stats = _worker.cache_stats()
+    # One image per task, nothing of it is needed again
+    _worker.clear()
+    return i, results, stats
+
+
+def _evaluate_sample(args):
+    i, params = args
+    return _worker.evaluate(i, params)
+
+
+def summarize(params, results):
+    errors = np.array([r[0] for r in results])
+    centers = [r[1] for r in results if r[1] is not None]
+    found = errors < MISS_PENALTY
+    return dict(params, loss=float(errors.mean()), found=int(found.sum()), samples=len(results),
+                mean_angle_error=float(errors[found].mean()) if found.any() else None,
+                mean_center_error=float(np.mean(centers)) if centers else None)
+
+
+def grid_search(samples, grid, workers):
+    combinations = grid_combinations(grid)
+    per_combination = [[None] * len(samples) for _ in combinations]
+    totals = {}
+    tasks = [(i, combinations) for i in range(len(samples))]
+    with mp.Pool(workers, initializer=_init_worker, initargs=(samples, 4 * max(len(v) for v in grid.values()) ** 2)) as pool:
+        for i, results, stats in pool.imap_unordered(_evaluate_grid_image, tasks):
+            for k, result in enumerate(results):
+                per_combination[k][i] = result
+            for name, (hits, misses) in stats.items():
+                total = totals.setdefault(name, [0, 0])
+                total[0] += hits
+                total[1] += misses
+    print('Stage cache hits/misses: ' + ', '.join(f"{name} {h}/{m}" for name, (h, m) in totals.items()))
+    return [summarize(params, results) for params, results in zip(combinations, per_combination)]
+
+
+def bayes_search(samples, grid, workers, trials, seed=0):
+    try:
+        import optuna
+    except ImportError:
+        raise RuntimeError("Bayesian search needs optuna installed, use --search grid instead")
+
+    rows = []
+    with mp.Pool(workers, initializer=_init_worker, initargs=(samples, 256)) as pool:
+        def objective(trial):
+            params = {name: trial.suggest_int(name, min(values), max(values)) for name, values in grid.items()}
+            results = pool.map(_evaluate_sample, [(i, params) for i in range(len(samples))])
+            row = summarize(params, results)
+            rows.append(row)
+            return row['loss']
+
+        optuna.logging.set_verbosity(optuna.logging.WARNING)
+        study = optuna.create_study(direction='minimize', sampler=optuna.samplers.TPESampler(seed=seed))
+        study.optimize(objective, n_trials=trials)
+    return rows
+
+
+def write_settings(path, params):
+    """ Store the tuned values in the [Settings] section, keeping every other key. A running app reloads them. """
+    store = ParameterStore()
+    store.load(path)
+    store.update(**{name: params[name] for name in GRID})
+    store.save(path)
+
+
+def parse_grid(overrides):
+    grid = OrderedDict((name, list(values)) for name, values in GRID.items())
+    for override in overrides or []:
+        name, _, values = override.partition('=')
+        if name not in grid:
+            raise SystemExit(f"Unknown parameter {name}, choose from {', '.join(grid)}")
+        grid[name] = [int(v) for v in values.split(',')]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('labels', nargs='?', help='label CSV (path, angle[, center_x, center_y, radius])')
+    parser.add_argument('--synthetic', type=int, default=0, help='use N generated discs instead of a label file')
+    parser.add_argument('--search', default='grid', choices=['grid', 'bayes'])
+    parser.add_argument('--trials', type=int, default=60, help='Bayesian search trials')
+    parser.add_argument('--grid', nargs='*', metavar='NAME=V1,V2', help='override the sweep values of a parameter')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='write every evaluated combination to this CSV')
+    parser.add_argument('--write', default=None, metavar='SETTINGS_INI', help='store the best parameters here')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        samples = synthetic_samples(args.synthetic)
+    elif args.labels:
+        samples = load_labels(args.labels)
+    else:
+        parser.error('give a label CSV or --synthetic N')
+    grid = parse_grid(args.grid)
+    workers = args.workers or os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    if args.search == 'grid':
+        rows = grid_search(samples, grid, workers)
+    else:
+        rows = bayes_search(samples, grid, workers, args.trials)
+    elapsed = time.perf_counter() - t0
+    rows.sort(key=lambda row: row['loss'])
+
+    print(f"{len(rows)} parameter sets x {len(samples)} samples in {elapsed:.1f} s")
+    for row in rows[:args.top]:
+        params = ' '.join(f"{name}={row[name]}" for name in grid)
+        error = f"{row['mean_angle_error']:.3f}" if row['mean_angle_error'] is not None else '-'
+        print(f"loss {row['loss']:7.3f}  found {row['found']}/{row['samples']}  angle error {error}  {params}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    if args.write:
+        write_settings(args.write, rows[0])
+        print(f"Best parameters written to {args.write}")
+
+
+if __name__ == '__main__':
+    main()